@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional
+
+
+class DuplicateResolver:
+    """
+    Resolves duplicate pairs one by one, grouping merged names with a union-find structure.
+    Merging is O(1): the replaced name is linked to the kept one, instead of rewriting all remaining rows.
+    Remaining rows are shown with their names resolved to the current representative,
+    rows whose names were already merged (directly or transitively) are skipped.
+    Undo pops a command log entry, so no copies of the remaining rows are kept.
+    """
+    def __init__(self, rows: List[Dict]):
+        self.rows = self.order_by_component(rows)
+        self.cursor = 0
+        self.parent: Dict[str, str] = {}  # replaced name -> kept name, as merged (uncompressed, undoable)
+        self.alias: Dict[str, str] = {}  # name -> representative, path-compressed cache of parent
+        self.log: List[Dict] = []
+
+    @staticmethod
+    def order_by_component(rows: List[Dict]) -> List[Dict]:
+        """
+        Orders rows so that pairs of the same connected component (duplicate cluster) are reviewed consecutively,
+        components in order of first appearance.
+        """
+        parent = {}
+
+        def find(name):
+            parent.setdefault(name, name)
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        for row in rows:
+            parent[find(row["left_name"])] = find(row["right_name"])
+        component_order = {}
+        for row in rows:
+            component_order.setdefault(find(row["left_name"]), len(component_order))
+        return sorted(rows, key=lambda row: component_order[find(row["left_name"])])
+
+    def find(self, name: str) -> str:
+        root = self.alias.get(name, name)
+        while root in self.parent:
+            root = self.parent[root]
+        if root != name:
+            self.alias[name] = root
+        return root
+
+    def skip_merged(self):
+        while self.cursor < len(self.rows):
+            row = self.rows[self.cursor]
+            if self.find(row["left_name"]) != self.find(row["right_name"]):
+                break
+            self.cursor += 1
+
+    def current_row(self) -> Optional[Dict]:
+        """
+        Returns the next row to resolve, with names replaced by their current representatives, or None if done.
+        """
+        self.skip_merged()
+        if self.cursor >= len(self.rows):
+            return None
+        row = self.rows[self.cursor]
+        return {**row, "left_name": self.find(row["left_name"]), "right_name": self.find(row["right_name"])}
+
+    def resolve(self, replaced: Optional[str] = None, kept: Optional[str] = None):
+        """
+        Resolves the current row: replaced is merged into kept, or, if replaced is None, the items are different.
+        """
+        self.skip_merged()
+        if replaced is not None:
+            replaced = self.find(replaced)
+            self.parent[replaced] = self.find(kept)
+        self.log.append({"cursor": self.cursor, "replaced": replaced})
+        self.cursor += 1
+
+    def undo(self) -> bool:
+        if not self.log:
+            return False
+        entry = self.log.pop()
+        self.cursor = entry["cursor"]
+        if entry["replaced"] is not None:
+            del self.parent[entry["replaced"]]
+            self.alias.clear()  # compressed paths may go through the removed link
+        return True
+
+    def remaining(self) -> int:
+        """
+        Upper bound of the rows left to resolve (rows merged transitively are skipped when reached).
+        """
+        return len(self.rows) - self.cursor
+
+    def resolved_names(self) -> List[str]:
+        """
+        Names replaced by another name.
+        """
+        return list(self.parent)
+
+    def components(self) -> Dict[str, List[str]]:
+        """
+        Groups of merged names, keyed by the kept (representative) name.
+        """
+        groups = {}
+        for name in self.parent:
+            groups.setdefault(self.find(name), [self.find(name)]).append(name)
+        return groups
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+POLL_INTERVAL_SECONDS = 1.0  # how often pages refresh the progress of running jobs
+
+
+class Job:
+    """
+    A unit of work submitted to the JobExecutor. The worker reports progress through report(stage, done, total),
+    the page polls status / progress and picks up result (or error) once finished.
+    """
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = PENDING
+        self.stage = None
+        self.done_count = 0
+        self.total_count = 0
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, done: int, total: int):
+        with self._lock:
+            self.stage, self.done_count, self.total_count = stage, done, total
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def fraction(self) -> float:
+        with self._lock:
+            return min(self.done_count / self.total_count, 1.0) if self.total_count else 0.0
+
+    def describe(self) -> str:
+        if self.status == PENDING:
+            return f"{self.name}: waiting for a free worker"
+        with self._lock:
+            if self.stage is None:
+                return f"{self.name}: starting"
+            return f"{self.name}: {self.stage} {self.done_count}/{self.total_count}"
+
+
+class JobExecutor:
+    """
+    Process-wide bounded worker pool for long running onboarding jobs (dedup, matching),
+    shared by all sessions so that concurrent operators do not oversubscribe the machine.
+    The number of workers is taken from ONBOARDING_MAX_JOBS (default 2).
+    """
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("ONBOARDING_MAX_JOBS", "2"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="onboarding-job")
+
+    def submit(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """
+        Runs func(*args, progress_callback=job.report, **kwargs) in the pool and returns the job.
+        """
+        job = Job(name)
+
+        def run():
+            job.status = RUNNING
+            try:
+                job.result = func(*args, progress_callback=job.report, **kwargs)
+                job.status = DONE
+            except Exception as e:
+                job.error = e
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+
+        self._pool.submit(run)
+        return job
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor() -> JobExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from client_boarding.utils.paths import PROJECT_ROOT
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(PROJECT_ROOT, "checkpoints", "match_checkpoints.sqlite")
+
+
+def to_jsonable(value):
+    """
+    json.dumps default: numpy scalars to python, missing values (NaN, pd.NA, NaT) to None, timestamps to ISO format.
+    Raises TypeError for other values, as json.dumps does.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, "isoformat"):  # pd.Timestamp, datetime, date
+        return value.isoformat()
+    if hasattr(value, "item") and getattr(value, "ndim", None) == 0:  # 0-d tensors and arrays
+        return value.item()
+    if isinstance(value, (str, int, float, bool, list, dict)):
+        return value
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+class MatchCheckpointStore:
+    """
+    SQLite store of matching sessions, keyed by the content hash of the client file.
+    A checkpoint holds the computed candidate table (the matcher output) and the review progress,
+    so that a session can be resumed without re-running the matcher. A checkpoint is only valid for the same
+    inventory file (content hash) and the same settings (columns, filters and matcher config).
+    """
+    def __init__(self, db_path: str = DEFAULT_CHECKPOINT_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "client_hash TEXT PRIMARY KEY, inventory_hash TEXT, settings TEXT, "
+                "matches TEXT, progress TEXT, updated_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:  # commits on success
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def encode_matches(matches: List[Dict]) -> str:
+        return json.dumps([
+            {
+                "client_item": match["client_item"],
+                "matches": match["matches"].to_json(orient="split", index=False, force_ascii=False),
+                "best_score": float(match["best_score"]),
+            }
+            for match in matches
+        ], ensure_ascii=False)
+
+    @staticmethod
+    def decode_matches(encoded: str) -> List[Dict]:
+        return [
+            {**match, "matches": pd.read_json(StringIO(match["matches"]), orient="split", dtype=False)}
+            for match in json.loads(encoded)
+        ]
+
+    def save_matches(self, client_hash: str, inventory_hash: str, settings: Dict, matches: List[Dict], progress: Dict):
+        """
+        Saves a new checkpoint (replacing any previous one of this client file) after the matcher ran.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    client_hash, inventory_hash, json.dumps(settings, sort_keys=True, default=str),
+                    self.encode_matches(matches), json.dumps(progress, default=to_jsonable), time.time(),
+                ),
+            )
+
+    def save_progress(self, client_hash: str, progress: Dict):
+        """
+        Updates only the review progress, cheap enough to be called after every decision.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE checkpoints SET progress = ?, updated_at = ? WHERE client_hash = ?",
+                (json.dumps(progress, default=to_jsonable), time.time(), client_hash),
+            )
+
+    def load(self, client_hash: str, inventory_hash: str, settings: Dict) -> Optional[Dict]:
+        """
+        Returns {"matches": [...], "progress": {...}, "updated_at": ...} if a valid checkpoint exists, None otherwise.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT inventory_hash, settings, matches, progress, updated_at FROM checkpoints WHERE client_hash = ?",
+                (client_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        saved_inventory_hash, saved_settings, matches, progress, updated_at = row
+        if saved_inventory_hash != inventory_hash or saved_settings != json.dumps(settings, sort_keys=True, default=str):
+            return None
+        return {"matches": self.decode_matches(matches), "progress": json.loads(progress), "updated_at": updated_at}
+
+    def exists(self, client_hash: str, inventory_hash: str, settings: Dict) -> Optional[float]:
+        """
+        Returns the last update time of a valid checkpoint without decoding it, None if there is none.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT updated_at FROM checkpoints WHERE client_hash = ? AND inventory_hash = ? AND settings = ?",
+                (client_hash, inventory_hash, json.dumps(settings, sort_keys=True, default=str)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, client_hash: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM checkpoints WHERE client_hash = ?", (client_hash,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> MatchCheckpointStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MatchCheckpointStore()
+        return _store
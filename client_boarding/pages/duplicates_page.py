@@ -6,9 +6,12 @@ import sys
 # Add the repo root (parent of client_boarding) to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+from client_boarding.core.duplicate_resolver import DuplicateResolver
+from client_boarding.core.job_executor import get_job_executor, FAILED, POLL_INTERVAL_SECONDS
 from client_boarding.utils.paths import PROJECT_ROOT
 from new_client_integ.find_duplicates import FindDuplicates
 from new_client_integ.data_loaders.excel_loader import CSVDataLoader
+from new_client_integ.file_cache import PARSED_FILE_CACHE
 from new_client_integ.utils import highlight_differences
 from scan_text_recipes.utils.utils import read_yaml
 
@@ -30,9 +33,8 @@ class DuplicatesPage:
             "filter_count": 0,
             "active_filter_col": None,
             "adding_filter": False,
-            "rows": [],
-            "resolved": [],
-            "undo_buffer": [],
+            "resolver": None,
+            "dup_job": None,
             "full_config": {},
             "loaded_file": None,
             "duplicates_ready": False,
@@ -46,7 +48,7 @@ class DuplicatesPage:
     @staticmethod
     def reset_state():
         for key in ["df", "columns", "name_column", "filter_config", "filter_count",
-                    "active_filter_col", "adding_filter", "rows", "resolved", "undo_buffer", "full_inventory_list",
+                    "active_filter_col", "adding_filter", "resolver", "dup_job", "full_inventory_list",
                     "full_config", "loaded_file"]:
             st.session_state[key] = [] if isinstance(st.session_state.get(key), list) else None
         st.rerun()
@@ -57,7 +59,8 @@ class DuplicatesPage:
         with col_upload:
             uploaded_file = st.file_uploader("Upload CSV", type=["csv"], key="file_upload")
             if uploaded_file and st.session_state.df is None:
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
+                # header and a sample only, the full file is parsed when looking for duplicates
+                df = PARSED_FILE_CACHE.get_preview(uploaded_file, encoding='utf-8')
                 df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
                 st.session_state.df = df
                 st.session_state.columns = df.columns.tolist()
@@ -88,7 +91,7 @@ class DuplicatesPage:
             selected_col = st.selectbox("Choose filter column", col_options, key="new_filter_col")
             if selected_col != "-- Select filter column --":
                 st.session_state.active_filter_col = selected_col
-                values = st.session_state.df[selected_col].dropna().unique().tolist()
+                values = PARSED_FILE_CACHE.get_distinct_values(st.session_state.loaded_file, selected_col, encoding='utf-8')
                 selected_val = st.selectbox(f"Choose value for {selected_col}", ["-- Select --"] + values, key=f"val_{selected_col}")
                 if selected_val != "-- Select --":
                     st.session_state.filter_config[selected_col] = selected_val
@@ -117,67 +120,85 @@ class DuplicatesPage:
         if st.session_state.get("show_filtered", False):
             st.subheader("🧾 Filtered Items")
             loader = CSVDataLoader(st.session_state.full_config)
-            items = loader.load(self.rewind_st_loaded_file())
+            items = PARSED_FILE_CACHE.get_items(st.session_state.loaded_file, loader)
             st.session_state.filtered_items = items
             st.write(f"✅ Found {len(items)} unique items")
             st.dataframe(pd.DataFrame(items, columns=["Item Name"]))
 
             # Now show "Find Duplicates" button
-            if st.button("🔍 Find Duplicates"):
+            job = st.session_state.dup_job
+            if st.button("🔍 Find Duplicates", disabled=job is not None and not job.finished):
                 dup_config = read_yaml(os.path.join(PROJECT_ROOT, "new_client_integ", "duplicates_config.yaml"))
-                find_duplicates = FindDuplicates(cfg=dup_config)
-                find_duplicates.set_data_loader(loader)
-                duplicates = find_duplicates.find_duplicates(filename=self.rewind_st_loaded_file())
-                pairs_df = pd.DataFrame(duplicates, columns=["left_name", "right_name", "score", "index1", "index2"])
-                st.session_state.full_inventory_list = find_duplicates.get_items_list()
-                print("full inventory list ######")
-                print(st.session_state.full_inventory_list)
-                st.session_state.rows = pairs_df.to_dict(orient="records")
-                st.session_state.resolved = []
-                st.session_state.undo_buffer = []
-                st.success("✅ Duplicate pairs loaded.")
-                st.session_state.duplicates_ready = True
+                st.session_state.dup_job = get_job_executor().submit(
+                    "Find duplicates", self.find_duplicates_job, dup_config, loader, self.rewind_st_loaded_file()
+                )
                 st.rerun()
+            if st.session_state.dup_job is not None:
+                self.render_duplicates_job()
+
+    @staticmethod
+    def find_duplicates_job(dup_config, loader, data: pd.DataFrame, progress_callback=None):
+        """
+        Runs in a background worker: no access to st.session_state here.
+        Every job has its own engine (loader, items), only the heavy models are shared (see resources),
+        so jobs of different sessions run concurrently.
+        """
+        find_duplicates = FindDuplicates(cfg=dup_config)
+        find_duplicates.set_progress_callback(progress_callback)
+        find_duplicates.set_data_loader(loader)
+        duplicates = find_duplicates.find_duplicates(filename=data)
+        return duplicates, find_duplicates.get_items_list()
+
+    @staticmethod
+    @st.fragment(run_every=POLL_INTERVAL_SECONDS)
+    def render_duplicates_job():
+        job = st.session_state.dup_job
+        if job is None:
+            return
+        if job.status == FAILED:
+            st.error(f"❌ {job.name} failed: {job.error}")
+            return
+        if not job.finished:
+            st.progress(job.fraction, text=job.describe())
+            return
+
+        duplicates, st.session_state.full_inventory_list = job.result
+        pairs_df = pd.DataFrame(duplicates, columns=["left_name", "right_name", "score", "index1", "index2"])
+        st.session_state.resolver = DuplicateResolver(pairs_df.to_dict(orient="records"))
+        st.session_state.dup_job = None
+        st.session_state.duplicates_ready = True
+        st.rerun()
 
     @staticmethod
     def rewind_st_loaded_file():
-        uploaded_file = st.session_state.loaded_file
-        uploaded_file.seek(0)
-        return pd.read_csv(uploaded_file, encoding='utf-8')
+        return PARSED_FILE_CACHE.get_dataframe(st.session_state.loaded_file, encoding='utf-8')
 
     def resolve_ui(self):
         st.title(self.title)
 
+        resolver = st.session_state.resolver
+        row = resolver.current_row()
+
         # Stats
         col1, col2 = st.columns([1, 1])
         with col1:
-            st.metric("Rows to Resolve", len(st.session_state.rows))
+            st.metric("Rows to Resolve", resolver.remaining())
         with col2:
-            if st.button("↩️ Undo", key="undo_button") and st.session_state.undo_buffer:
-                entry = st.session_state.undo_buffer.pop()
-                st.session_state.rows.insert(0, entry["row"])
-                for name in entry["resolved"]:
-                    if name in st.session_state.resolved:
-                        st.session_state.resolved.remove(name)
-                if "previous_rows" in entry:
-                    st.session_state.rows[1:] = entry["previous_rows"]
+            if st.button("↩️ Undo", key="undo_button") and resolver.undo():
                 st.rerun()
 
-        if not st.session_state.rows:
+        if row is None:
             st.success("✅ Resolution complete!")
 
-            clean_list = [name for name in st.session_state.full_inventory_list if name not in st.session_state.resolved]
+            resolved_names = set(resolver.resolved_names())
+            clean_list = [name for name in st.session_state.full_inventory_list if name not in resolved_names]
 
             # 🟢 Filter the original dataframe
             if st.session_state.df is not None and st.session_state.name_column:
-                print("clean list ######")
-                print(clean_list)
-                print("Final df ######")
-                print(st.session_state.df)
-                print("Final df clean ######")
-                print(st.session_state.df[st.session_state.name_column].isin(clean_list))
-                final_df = st.session_state.df[
-                    st.session_state.df[st.session_state.name_column].isin(clean_list)
+                full_df = self.rewind_st_loaded_file()  # st.session_state.df is only a preview
+                full_df = full_df.loc[:, ~full_df.columns.str.startswith("Unnamed")]
+                final_df = full_df[
+                    full_df[st.session_state.name_column].isin(clean_list)
                 ]
                 csv_bytes = final_df.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig')
                 st.download_button(
@@ -188,7 +209,6 @@ class DuplicatesPage:
                 )
             return
 
-        row = st.session_state.rows[0]
         left, left_but, mid_but, right_but, right = st.columns([8, 1, 1, 1, 8])
         highlighted_left, highlighted_right = highlight_differences(row["left_name"], row["right_name"])
         with left:
@@ -210,36 +230,12 @@ class DuplicatesPage:
             st.markdown(f"<div style='font-family:monospace; text-align: left; font-size:18px'>{highlighted_right}</div>", unsafe_allow_html=True)
 
         if resolved is not None:
-            # Determine replacement logic
             if not resolved:  # ↔️ different items, no replacement
-                st.session_state.undo_buffer.append({"row": row, "resolved": []})
-                st.session_state.rows.pop(0)
-                st.rerun()
-
-            replaced = resolved[0]
-            kept = row["left_name"] if replaced == row["right_name"] else row["right_name"]
-
-            # Update all remaining rows
-            updated_rows = []
-            for r in st.session_state.rows[1:]:
-                new_row = r.copy()
-                if new_row["left_name"] == replaced:
-                    new_row["left_name"] = kept
-                if new_row["right_name"] == replaced:
-                    new_row["right_name"] = kept
-                updated_rows.append(new_row)
-
-            # Save undo state
-            st.session_state.undo_buffer.append({
-                "row": row,
-                "resolved": [replaced],
-                "replacement": kept,
-                "previous_rows": st.session_state.rows[1:]  # save state for undo
-            })
-
-            # Apply updates
-            st.session_state.resolved.append(replaced)
-            st.session_state.rows = [*updated_rows]
+                resolver.resolve()
+            else:
+                replaced = resolved[0]
+                kept = row["left_name"] if replaced == row["right_name"] else row["right_name"]
+                resolver.resolve(replaced=replaced, kept=kept)
             st.rerun()
 
     def render(self):
@@ -1,4 +1,5 @@
 import os
+import time
 import streamlit as st
 import pandas as pd
 import sys
@@ -6,10 +7,14 @@ import sys
 # Add the repo root (parent of client_boarding) to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+from client_boarding.core.job_executor import get_job_executor, FAILED, POLL_INTERVAL_SECONDS
+from client_boarding.core.match_checkpoints import get_checkpoint_store
 from client_boarding.utils.paths import PROJECT_ROOT
 from client_boarding.pages.duplicates_page import DuplicatesPage
 from new_client_integ.find_matches import FindMatches
 from new_client_integ.data_loaders.excel_loader import CSVDataLoader, InventoryLoader
+from new_client_integ.file_cache import PARSED_FILE_CACHE, content_hash
+from new_client_integ.resources import config_hash
 from scan_text_recipes.utils.utils import read_yaml
 
 
@@ -29,6 +34,7 @@ class MatchPage(DuplicatesPage):
             "all_matches": None,
             "matches": None,
             "matcher": None,
+            "match_job": None,
             "inventory_df": None,
             "client_df": None,
             "inv_columns": [],
@@ -38,6 +44,11 @@ class MatchPage(DuplicatesPage):
             "client_name_col": None,
             "client_filter_config": {},
             "unresolved_indices": [],
+            "unresolved_positions": [],
+            "inv_file_hash": None,
+            "client_file_hash": None,
+            "inv_upload": None,
+            "client_upload": None,
             "certain_threshold": None,
             "min_display_threshold": None,
             "save_path": None,
@@ -51,13 +62,14 @@ class MatchPage(DuplicatesPage):
         st.header("📦 Step 1: Upload and Configure Inventory")
         inv_file = st.file_uploader("Upload Inventory CSV", type="csv", key="inv_file")
 
-        if inv_file and st.session_state.inventory_df is None:
-            inv_df = pd.read_csv(inv_file, encoding='utf-8')
-            inv_df = inv_df.loc[:, ~inv_df.columns.str.startswith("Unnamed")]
-            st.session_state.inventory_df = inv_df
-            st.session_state.inv_columns = inv_df.columns.tolist()
+        if inv_file and st.session_state.inv_upload is None:
+            # header and a sample only, the full file is parsed when the matcher runs
+            preview = PARSED_FILE_CACHE.get_preview(inv_file, encoding='utf-8')
+            st.session_state.inv_upload = inv_file
+            st.session_state.inv_file_hash = content_hash(inv_file)
+            st.session_state.inv_columns = [col for col in preview.columns if not col.startswith("Unnamed")]
 
-        if st.session_state.inventory_df is not None:
+        if st.session_state.inv_upload is not None:
             st.session_state.inv_name_col = st.selectbox("Inventory Name Column", st.session_state.inv_columns)
             st.session_state.inv_id_col = st.selectbox("Inventory ID Column", st.session_state.inv_columns)
 
@@ -66,42 +78,61 @@ class MatchPage(DuplicatesPage):
         st.header("🧾 Step 2: Upload and Configure Client List")
         client_file = st.file_uploader("Upload Client CSV", type="csv", key="client_file")
 
-        if client_file and st.session_state.client_df is None:
-            client_df = pd.read_csv(client_file, encoding='utf-8')
-            client_df = client_df.loc[:, ~client_df.columns.str.startswith("Unnamed")]
-            st.session_state.client_df = client_df
-            st.session_state.client_columns = client_df.columns.tolist()
+        if client_file and st.session_state.client_upload is None:
+            # header and a sample only, the full file is parsed when the matcher runs
+            preview = PARSED_FILE_CACHE.get_preview(client_file, encoding='utf-8')
+            st.session_state.client_upload = client_file
+            st.session_state.client_file_hash = content_hash(client_file)
+            st.session_state.client_columns = [col for col in preview.columns if not col.startswith("Unnamed")]
 
-        if st.session_state.client_df is not None:
+        if st.session_state.client_upload is not None:
             st.session_state.client_name_col = st.selectbox("Client Name Column", st.session_state.client_columns)
 
             filter_config = {}
             with st.expander("⚙️ Filter Client Items (optional)"):
-                for col in st.session_state.client_columns:
-                    unique_values = st.session_state.client_df[col].dropna().unique().tolist()
-                    if len(unique_values) < 50:
+                # distinct values are computed only for the columns chosen here
+                filter_columns = st.multiselect("Filter columns", st.session_state.client_columns)
+                for col in filter_columns:
+                    unique_values = PARSED_FILE_CACHE.get_distinct_values(
+                        st.session_state.client_upload, col, encoding='utf-8'
+                    )
+                    if len(unique_values) >= 50:
+                        st.caption(f"{col}: too many distinct values to filter by ({len(unique_values)})")
+                    else:
                         selected = st.multiselect(f"Filter by {col}", unique_values)
                         if selected:
                             filter_config[col] = selected
             st.session_state.client_filter_config = filter_config
 
     @staticmethod
-    def run_matcher():
+    def load_full_frames():
+        """
+        Full parse of both uploads (cached by content hash), deferred until they are actually needed.
+        """
+        if st.session_state.inventory_df is None:
+            inv_df = PARSED_FILE_CACHE.get_dataframe(st.session_state.inv_upload, encoding='utf-8')
+            st.session_state.inventory_df = inv_df.loc[:, ~inv_df.columns.str.startswith("Unnamed")].copy()
+        if st.session_state.client_df is None:
+            client_df = PARSED_FILE_CACHE.get_dataframe(st.session_state.client_upload, encoding='utf-8')
+            # copy: matched_id is added to it
+            st.session_state.client_df = client_df.loc[:, ~client_df.columns.str.startswith("Unnamed")].copy()
         if 'matched_id' not in st.session_state.client_df.columns:
             st.session_state.client_df['matched_id'] = ""
 
+    @staticmethod
+    def run_matcher():
         if not all([
-            st.session_state.inventory_df is not None,
-            st.session_state.client_df is not None,
+            st.session_state.inv_upload is not None,
+            st.session_state.client_upload is not None,
             st.session_state.inv_name_col,
             st.session_state.inv_id_col,
             st.session_state.client_name_col
         ]):
             return
+        MatchPage.load_full_frames()
 
-        cfg = read_yaml(os.path.join(PROJECT_ROOT, "new_client_integ", "matcher_config.yaml"))
+        cfg = MatchPage.read_matcher_config()
         st.session_state.config = cfg
-        st.session_state.matcher = FindMatches(cfg=cfg)
 
         inv_loader = InventoryLoader({
             "name_column": st.session_state.inv_name_col,
@@ -112,10 +143,41 @@ class MatchPage(DuplicatesPage):
             "filter_by": st.session_state.client_filter_config or {}
         })
 
-        st.session_state.matcher.inventory = inv_loader.load(st.session_state.inventory_df)
         client_items = client_loader.load(st.session_state.client_df)
+        st.session_state.match_job = get_job_executor().submit(
+            "Match items", MatchPage.match_job, cfg, inv_loader, st.session_state.inventory_df, client_items
+        )
+        st.rerun()
+
+    @staticmethod
+    def match_job(cfg, inv_loader, inventory_df: pd.DataFrame, client_items, progress_callback=None):
+        """
+        Runs in a background worker: no access to st.session_state here.
+        Every job has its own engine (inventory, progress callback), only the heavy models are shared (see resources),
+        so jobs of different sessions run concurrently.
+        """
+        matcher = FindMatches(cfg=cfg)
+        matcher.set_progress_callback(progress_callback)
+        matcher.inventory = inv_loader.load(inventory_df)
+        return matcher.find_matches(client_inventory_list=client_items)
+
+    @staticmethod
+    @st.fragment(run_every=POLL_INTERVAL_SECONDS)
+    def render_match_job():
+        job = st.session_state.match_job
+        if job is None:
+            return
+        if job.status == FAILED:
+            st.error(f"❌ {job.name} failed: {job.error}")
+            return
+        if not job.finished:
+            st.progress(job.fraction, text=job.describe())
+            return
+        st.session_state.match_job = None
+        MatchPage.apply_matches(job.result)
 
-        matches = st.session_state.matcher.find_matches(client_inventory_list=client_items)
+    @staticmethod
+    def apply_matches(matches):
         resolved_ids = list(st.session_state.client_df['matched_id'])  # Existing matches
         unresolved_matches = []
         unresolved_indices = []
@@ -124,7 +186,8 @@ class MatchPage(DuplicatesPage):
             name: idx for idx, name in enumerate(st.session_state.client_df[st.session_state.client_name_col])
         }
 
-        for match in matches:
+        unresolved_positions = []
+        for position, match in enumerate(matches):
             item_name = match['client_item']
             match_score = match['matches']['score'].iloc[0]
             match_id = match['matches']['_id'].iloc[0]
@@ -143,20 +206,98 @@ class MatchPage(DuplicatesPage):
                 resolved_ids[idx] = None
                 unresolved_matches.append(match)
                 unresolved_indices.append(idx)
+                unresolved_positions.append(position)
 
         st.session_state.all_matches = matches
         st.session_state.matches = unresolved_matches
         st.session_state.unresolved_indices = unresolved_indices
+        st.session_state.unresolved_positions = unresolved_positions
         st.session_state.resolved_ids = resolved_ids
         st.session_state.match_index = 0
         st.session_state.undo_buffer = []
 
         st.session_state.client_df['matched_id'] = resolved_ids
+        get_checkpoint_store().save_matches(
+            st.session_state.client_file_hash, st.session_state.inv_file_hash,
+            MatchPage.checkpoint_settings(st.session_state.config), matches, MatchPage.checkpoint_progress(),
+        )
+        st.rerun()
+
+    @staticmethod
+    def read_matcher_config():
+        return read_yaml(os.path.join(PROJECT_ROOT, "new_client_integ", "matcher_config.yaml"))
+
+    @staticmethod
+    def checkpoint_settings(cfg):
+        """
+        Everything a checkpoint depends on besides the two files: a checkpoint saved with other settings is not resumed.
+        """
+        return {
+            "inv_name_col": st.session_state.inv_name_col,
+            "inv_id_col": st.session_state.inv_id_col,
+            "client_name_col": st.session_state.client_name_col,
+            "client_filter_config": st.session_state.client_filter_config,
+            "matcher_config": config_hash(cfg),
+        }
+
+    @staticmethod
+    def checkpoint_progress():
+        return {
+            "resolved_ids": st.session_state.resolved_ids,
+            "unresolved_indices": st.session_state.unresolved_indices,
+            "unresolved_positions": st.session_state.unresolved_positions,
+            "match_index": st.session_state.match_index,
+            "undo_buffer": st.session_state.undo_buffer,
+        }
+
+    @staticmethod
+    def autosave():
+        if st.session_state.client_file_hash is not None:
+            get_checkpoint_store().save_progress(st.session_state.client_file_hash, MatchPage.checkpoint_progress())
+
+    @staticmethod
+    def render_resume_checkpoint():
+        if not all([
+            st.session_state.inv_file_hash,
+            st.session_state.client_file_hash,
+            st.session_state.inv_name_col,
+            st.session_state.inv_id_col,
+            st.session_state.client_name_col
+        ]):
+            return
+        cfg = MatchPage.read_matcher_config()
+        settings = MatchPage.checkpoint_settings(cfg)
+        store = get_checkpoint_store()
+        updated_at = store.exists(st.session_state.client_file_hash, st.session_state.inv_file_hash, settings)
+        if updated_at is None:
+            return
+        saved_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated_at))
+        if not st.button(f"▶️ Resume review saved at {saved_at}"):
+            return
+
+        checkpoint = store.load(st.session_state.client_file_hash, st.session_state.inv_file_hash, settings)
+        MatchPage.load_full_frames()
+        progress = checkpoint["progress"]
+        all_matches = checkpoint["matches"]
+        st.session_state.config = cfg
+        st.session_state.all_matches = all_matches
+        st.session_state.matches = [all_matches[position] for position in progress["unresolved_positions"]]
+        st.session_state.unresolved_positions = progress["unresolved_positions"]
+        st.session_state.unresolved_indices = progress["unresolved_indices"]
+        st.session_state.resolved_ids = progress["resolved_ids"]
+        st.session_state.match_index = progress["match_index"]
+        st.session_state.undo_buffer = [tuple(entry) for entry in progress["undo_buffer"]]
+        st.session_state.client_df['matched_id'] = st.session_state.resolved_ids
         st.rerun()
 
     def render_run_matcher_button(self):
-        if st.button("🔍 Run Matcher"):
+        job = st.session_state.match_job
+        if st.button("🔍 Run Matcher", disabled=job is not None and not job.finished):
             self.run_matcher()
+        if st.session_state.match_job is not None:
+            self.render_match_job()
+        else:
+            self.render_resume_checkpoint()
 
     @staticmethod
     def render_intermediate_save_controls():
@@ -224,6 +365,7 @@ class MatchPage(DuplicatesPage):
                         st.session_state.undo_buffer.append((actual_index, st.session_state.resolved_ids[actual_index]))
                         st.session_state.resolved_ids[actual_index] = row['_id']
                         st.session_state.match_index += 1
+                        self.autosave()
                         st.rerun()
                 with but:
                     st.markdown(f"{row['score']:.2f}", unsafe_allow_html=True)
@@ -232,6 +374,7 @@ class MatchPage(DuplicatesPage):
                 st.session_state.undo_buffer.append((actual_index, st.session_state.resolved_ids[actual_index]))
                 st.session_state.resolved_ids[actual_index] = NEW_ITEM_MARKER
                 st.session_state.match_index += 1
+                self.autosave()
                 st.rerun()
 
         if st.button("↩️ Undo") and st.session_state.undo_buffer:
@@ -239,6 +382,7 @@ class MatchPage(DuplicatesPage):
             st.session_state.resolved_ids[last_idx] = last_val
             if last_idx in st.session_state.unresolved_indices:
                 st.session_state.match_index = st.session_state.unresolved_indices.index(last_idx)
+            self.autosave()
             st.rerun()
 
     def render(self):
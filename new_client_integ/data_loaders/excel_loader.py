@@ -1,6 +1,15 @@
+import os
+from typing import Dict, Iterator, List, Tuple
+
 import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
+from new_client_integ.file_cache import PARSED_FILE_CACHE
 from new_client_integ.utils import select_rows_by_dict, clean_text
 
 
@@ -11,6 +20,16 @@ class BaseDataLoader:
     def load(self, file_path):
         raise NotImplementedError("Subclasses should implement this method.")
 
+    @staticmethod
+    def read_dataframe(source) -> pd.DataFrame:
+        """
+        Returns the source as a DataFrame: DataFrames are returned as is, CSV paths and file-like objects
+        are parsed once and cached by content hash. The result is shared, copy it before modifying.
+        """
+        if isinstance(source, pd.DataFrame):
+            return source
+        return PARSED_FILE_CACHE.get_dataframe(source, encoding="utf-8")
+
 
 class CSVDataLoader(BaseDataLoader):
     def __init__(self, config):
@@ -22,8 +41,8 @@ class CSVDataLoader(BaseDataLoader):
         :param file_path:
         :return:
         """
-        data = pd.read_csv(file_path) if isinstance(file_path, str) else file_path
-        filt_data = select_rows_by_dict(data, self.config["filter_by"])
+        data = self.read_dataframe(file_path)
+        filt_data = select_rows_by_dict(data, self.config.get("filter_by", {}))
         items_list = list(filt_data[self.config["name_column"]].dropna().unique())
         print(items_list)
         items_list = [item.strip() for item in items_list]
@@ -43,7 +62,7 @@ class InventoryLoader(BaseDataLoader):
         :param file_path:
         :return:
         """
-        data = pd.read_csv(file_path) if isinstance(file_path, str) else file_path
+        data = self.read_dataframe(file_path)
         # filt_data = select_rows_by_dict(data, self.config["filter_by"])
         items_df = data[[self.config["id_column"], self.config["name_column"]]].dropna()
         items_df.rename(columns={self.config["id_column"]: "_id", self.config["name_column"]: "_name"}, inplace=True)
@@ -65,13 +84,160 @@ class CSVListLoader(BaseDataLoader):
         :param file_path:
         :return:
         """
-        inventory_items = pd.read_csv(file_path, index_col=False, encoding="utf-8")
+        inventory_items = PARSED_FILE_CACHE.get_dataframe(file_path, index_col=False, encoding="utf-8")
         inventory_items = inventory_items.T.iloc[0]
         inventory_items = [clean_text(item) for item in list(inventory_items)]
         inventory_items = np.unique(inventory_items).tolist()
         return inventory_items
 
 
+class ArrowReaderMixin:
+    """
+    Reads only the requested columns of a CSV/Parquet file with pyarrow, pushing filter_by predicates
+    (a single value, or a list of allowed values) into the scan instead of filtering a fully parsed DataFrame.
+    Filter columns missing from the file are ignored, as in select_rows_by_dict. Filter values are cast to the
+    column type (e.g. "5" for an integer column); values that can't be cast are compared as text.
+    """
+    file_format = "csv"
+
+    @staticmethod
+    def filter_condition(col: str, val, field_type):
+        values = list(val) if isinstance(val, (list, tuple, set)) else [val]
+        try:
+            return ds.field(col).isin(pa.array(values).cast(field_type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return ds.field(col).cast(pa.string()).isin(pa.array([str(value) for value in values], pa.string()))
+
+    def filter_expression(self, filter_by: Dict, schema):
+        expression = None
+        for col, val in filter_by.items():
+            condition = self.filter_condition(col, val, schema.field(col).type)
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def schema_names(self, source) -> List[str]:
+        """
+        Column names of a file-like source, read from its header only; the source is rewound afterward.
+        """
+        if self.file_format == "parquet":
+            names = pq.read_schema(source).names
+        else:
+            names = pa_csv.open_csv(source).schema.names
+        source.seek(0)
+        return names
+
+    def read_columns(self, source, columns: List[str], filter_by: Dict = None) -> pd.DataFrame:
+        filter_by = filter_by or {}
+        if isinstance(source, pd.DataFrame):
+            return select_rows_by_dict(source, filter_by)[columns]
+
+        if isinstance(source, (str, os.PathLike)):
+            dataset = ds.dataset(source, format=self.file_format)
+            filter_by = {col: val for col, val in filter_by.items() if col in dataset.schema.names}
+            table = dataset.to_table(columns=columns, filter=self.filter_expression(filter_by, dataset.schema))
+        else:  # file-like, e.g. an uploaded file
+            names = self.schema_names(source)
+            filter_by = {col: val for col, val in filter_by.items() if col in names}
+            read_columns = list(dict.fromkeys(columns + list(filter_by)))
+            if self.file_format == "parquet":
+                table = pq.read_table(source, columns=read_columns)
+            else:
+                table = pa_csv.read_csv(source, convert_options=pa_csv.ConvertOptions(include_columns=read_columns))
+            if filter_by:
+                table = table.filter(self.filter_expression(filter_by, table.schema))
+            table = table.select(columns)
+        return table.to_pandas()
+
+
+class ArrowCSVDataLoader(ArrowReaderMixin, CSVDataLoader):
+    """
+    CSVDataLoader reading only the name column and filtering while scanning.
+    """
+    def load(self, file_path):
+        data = self.read_columns(file_path, [self.config["name_column"]], self.config.get("filter_by"))
+        return super().load(data)
+
+
+class ParquetDataLoader(ArrowCSVDataLoader):
+    file_format = "parquet"
+
+
+class ArrowInventoryLoader(ArrowReaderMixin, InventoryLoader):
+    """
+    InventoryLoader reading only the id and name columns, optionally filtered by filter_by.
+    """
+    def load(self, file_path):
+        columns = list(dict.fromkeys([self.config["id_column"], self.config["name_column"]]))
+        data = self.read_columns(file_path, columns, self.config.get("filter_by"))
+        return super().load(data)
+
+
+class ParquetInventoryLoader(ArrowInventoryLoader):
+    file_format = "parquet"
+
+
+class ExcelReaderMixin:
+    """
+    Streams rows of an .xlsx workbook in read-only mode, yielding only the requested columns of rows matching
+    filter_by, so that very large workbooks are processed with constant memory.
+    The first row of the sheet (config "sheet_name", default the active sheet) is the header.
+    Cells are matched to filter_by values as text, so a numeric cell 5 (or 5.0) matches a config value "5".
+    """
+    @staticmethod
+    def cell_text(value) -> str:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+
+    def iter_records(self, source, columns: List[str], filter_by: Dict = None) -> Iterator[Tuple]:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet_name = self.config.get("sheet_name")
+            sheet = workbook[sheet_name] if sheet_name else workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+            missing = [col for col in columns if col not in header]
+            if missing:
+                raise ValueError(f"Columns {missing} not found in sheet '{sheet.title}'.")
+            column_indices = [header.index(col) for col in columns]
+            filters = [
+                (header.index(col), {self.cell_text(v) for v in (val if isinstance(val, (list, tuple, set)) else [val])})
+                for col, val in (filter_by or {}).items() if col in header
+            ]
+            for row in rows:
+                if all(idx < len(row) and row[idx] is not None and self.cell_text(row[idx]) in allowed for idx, allowed in filters):
+                    yield tuple(row[idx] if idx < len(row) else None for idx in column_indices)
+        finally:
+            workbook.close()
+
+
+class ExcelDataLoader(ExcelReaderMixin, CSVDataLoader):
+    """
+    CSVDataLoader counterpart for .xlsx files, streaming only the name column.
+    """
+    def load(self, file_path):
+        if isinstance(file_path, pd.DataFrame):
+            return super().load(file_path)
+        items = dict.fromkeys(
+            str(name).strip()
+            for name, in self.iter_records(file_path, [self.config["name_column"]], self.config.get("filter_by"))
+            if name is not None
+        )
+        return list(items)
+
+
+class ExcelInventoryLoader(ExcelReaderMixin, InventoryLoader):
+    """
+    InventoryLoader counterpart for .xlsx files, streaming only the id and name columns.
+    """
+    def load(self, file_path):
+        if isinstance(file_path, pd.DataFrame):
+            return super().load(file_path)
+        columns = [self.config["id_column"], self.config["name_column"]]
+        records = self.iter_records(file_path, columns, self.config.get("filter_by"))
+        return super().load(pd.DataFrame.from_records(records, columns=columns))
+
+
 if __name__ == '__main__':
     filename = "D:\\Projects\\Kaufmann_and_Co\\ingredients_matching\\new_client.csv"
     cfg = {
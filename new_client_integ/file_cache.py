@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+
+import pandas as pd
+
+from new_client_integ.utils import USE_CACHE
+
+HASH_CHUNK_SIZE = 1 << 20
+PREVIEW_ROWS = 200
+MAX_CACHED_FILES = 16
+
+# content hashes of immutable uploads (by file id) and of files on disk (by path, mtime and size), least recent first
+_known_hashes = OrderedDict()
+_known_hashes_lock = threading.Lock()
+
+
+def _hash_key(source):
+    upload_id = getattr(source, "file_id", None)  # Streamlit uploads are immutable and carry a unique id
+    if upload_id is not None:
+        return "upload", upload_id
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        return "path", os.path.abspath(source), stat.st_mtime_ns, stat.st_size
+    return None
+
+
+def content_hash(source) -> str:
+    """
+    sha256 of the content of a file path, a file-like object (e.g. a Streamlit upload) or raw bytes.
+    File-like objects are rewound afterward. Hashes of uploads and unchanged files are remembered.
+    """
+    hash_key = _hash_key(source)
+    if hash_key is not None:
+        with _known_hashes_lock:
+            if hash_key in _known_hashes:
+                _known_hashes.move_to_end(hash_key)
+                return _known_hashes[hash_key]
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    elif hasattr(source, "getvalue"):
+        digest.update(source.getvalue())
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(0)
+    if hash_key is not None:
+        with _known_hashes_lock:
+            _known_hashes[hash_key] = digest.hexdigest()
+            while len(_known_hashes) > MAX_CACHED_FILES:
+                _known_hashes.popitem(last=False)
+    return digest.hexdigest()
+
+
+def rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+class ParsedFileCache:
+    """
+    LRU cache of parsed files, keyed by content hash, so an upload is parsed once per session
+    regardless of how many Streamlit reruns or button clicks read it.
+    Cached DataFrames are shared: callers that mutate them must work on a copy.
+    """
+    def __init__(self, max_entries: int = MAX_CACHED_FILES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if not USE_CACHE:
+            return compute()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_dataframe(self, source, **read_kwargs) -> pd.DataFrame:
+        """
+        pd.read_csv of the source, cached by content hash and read arguments.
+        """
+        key = ("dataframe", content_hash(source), json.dumps(read_kwargs, sort_keys=True, default=str))
+        return self.get_or_compute(key, lambda: pd.read_csv(rewind(source), **read_kwargs))
+
+    def get_preview(self, source, nrows: int = PREVIEW_ROWS, **read_kwargs) -> pd.DataFrame:
+        """
+        Header and the first nrows rows of the source, enough to populate column selectors without a full parse.
+        """
+        return self.get_dataframe(source, nrows=nrows, **read_kwargs)
+
+    def get_distinct_values(self, source, column: str, **read_kwargs) -> List:
+        """
+        Distinct non-null values of a single column, parsing only that column, computed on first request.
+        """
+        key = ("distinct", content_hash(source), column, json.dumps(read_kwargs, sort_keys=True, default=str))
+        return self.get_or_compute(
+            key, lambda: pd.read_csv(rewind(source), usecols=[column], **read_kwargs)[column].dropna().unique().tolist()
+        )
+
+    def get_items(self, source, loader) -> Any:
+        """
+        Result of loader.load(source) (e.g. a filtered item list), cached by content hash, loader type and config.
+        """
+        key = (
+            "items", content_hash(source), loader.__class__.__name__,
+            json.dumps(loader.config, sort_keys=True, default=str),
+        )
+        return self.get_or_compute(key, lambda: loader.load(rewind(source)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+PARSED_FILE_CACHE = ParsedFileCache()
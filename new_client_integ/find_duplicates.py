@@ -1,15 +1,15 @@
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
-import stanza
 import torch
 
 from new_client_integ import LOADER_PACKAGE_PATH, PRE_CLASSIFIERS_PATH, REFINERS_PATH
 from new_client_integ.data_loaders.excel_loader import BaseDataLoader
 from new_client_integ.fine_tuning.refiner import BaseRefiner
 from new_client_integ.pre_classifiers.pre_classifier import BaseClassifier
-from new_client_integ.utils import clean_text
+from new_client_integ.resources import get_stanza_pipeline
+from new_client_integ.utils import clean_text, group_by_canonical_key
 from scan_text_recipes.utils.utils import initialize_pipeline_segments, read_yaml
 
 
@@ -49,7 +49,7 @@ class FindDuplicates:
     def load_lemmatization_model(self):
         apply_lemmatization = self.config.get("lemmatization", {}).get("enabled", False)
         if apply_lemmatization:
-            self.lemmatization_model = stanza.Pipeline(lang=self.config['lemmatization']['language'], processors='tokenize,mwt,pos,lemma')
+            self.lemmatization_model = get_stanza_pipeline(self.config['lemmatization']['language'])
 
     @staticmethod
     def get_words_list(items_list):
@@ -78,25 +78,97 @@ class FindDuplicates:
         words_dict = {word: embedding.cpu() for word, embedding in zip(words_list, words_embeddings)}
         return words_dict
 
-    def find_duplicates(self, filename):
-        # Placeholder for actual duplicate finding logic
-        # Load data
-        self.items_list = self.data_loader.load(filename)
-        # Preprocess data
-        item_pairs = self.pre_classifier.classify(self.items_list)
+    def classify_and_refine(self, items_list):
+        """
+        Runs the pre-classifier and all refiners over the given items.
+        """
+        item_pairs = self.pre_classifier.classify(items_list)
 
         # reduce embedding space to words in the items_list
-        words_embeddings_dict = self.create_word_embeddings_dictionary(self.items_list) \
+        words_embeddings_dict = self.create_word_embeddings_dictionary(items_list) \
             if self.config.get("use_word_embeddings", True) else None
 
         for fine_tuner in self.fine_tuners:
             item_pairs = fine_tuner.refine(item_pairs, words_embeddings_dict)
+        return item_pairs
+
+    @staticmethod
+    def fan_out_pairs(key_pairs, groups: Dict[str, List[str]], items_list: List[str]):
+        """
+        Expands pairs found between group representatives back to the original items.
+        groups maps the representative (first item) of every canonical key group to the items of the group.
+        Variants sharing a key are paired with the first of them (score 1.0),
+        pairs between representatives are expanded to every combination of their original items.
+        """
+        item_index = {item: idx for idx, item in enumerate(items_list)}
+        item_pairs = []
+        for variants in groups.values():
+            for variant in variants[1:]:
+                item_pairs.append((variants[0], variant, 1.0, item_index[variants[0]], item_index[variant]))
+        for key1, key2, score, _, _ in key_pairs:
+            for item1 in groups[key1]:
+                for item2 in groups[key2]:
+                    item_pairs.append((item1, item2, score, item_index[item1], item_index[item2]))
+        return item_pairs
+
+    def find_duplicates(self, filename):
+        # Load data
+        self.items_list = self.data_loader.load(filename)
+        if self.config.get("canonicalize", False):
+            # embed, score and refine once per canonical key, then fan out to the original items;
+            # the first original item of each group is embedded, not the (lowercased, normalized) key itself
+            groups = {variants[0]: variants for variants in group_by_canonical_key(self.items_list).values()}
+            key_pairs = self.classify_and_refine(list(groups))
+            item_pairs = self.fan_out_pairs(key_pairs, groups, self.items_list)
+        else:
+            item_pairs = self.classify_and_refine(self.items_list)
         for ing1, ing2, score, _, _ in item_pairs:
             print(f"{ing1} <-> {ing2}: {score:.2f}")
         print("\n" * 5)
         print(f"Total pairs: {len(item_pairs)}")
         return item_pairs
 
+    def build_catalog_index(self, filename, index_path: str = None) -> Dict:
+        """
+        Builds the index of an already deduplicated catalog, to be used by find_duplicates_incremental.
+        The index is saved to index_path if given.
+        """
+        if not hasattr(self.pre_classifier, "build_index"):
+            raise ValueError(f"{self.pre_classifier.__class__.__name__} does not support incremental deduplication.")
+        catalog_index = self.pre_classifier.build_index(self.data_loader.load(filename))
+        if index_path is not None:
+            self.pre_classifier.save_index(catalog_index, index_path)
+        return catalog_index
+
+    def find_duplicates_incremental(self, filename, catalog_index):
+        """
+        Finds duplicates of newly added items only: new items are compared against the catalog index
+        (a dict from build_catalog_index or a path to a saved one) and against each other.
+        Items already present in the catalog are skipped. Pair indices refer to catalog items followed by new items,
+        which is also what get_items_list returns afterward.
+        """
+        if isinstance(catalog_index, str):
+            catalog_index = self.pre_classifier.load_index(catalog_index)
+        catalog_items = set(catalog_index["items"])
+        new_items = [item for item in dict.fromkeys(self.data_loader.load(filename)) if item not in catalog_items]
+        self.items_list = catalog_index["items"] + new_items
+
+        item_pairs = self.pre_classifier.classify_against(new_items, catalog_index)
+        paired_items = list(dict.fromkeys(item for pair in item_pairs for item in pair[:2]))
+        words_embeddings_dict = self.create_word_embeddings_dictionary(paired_items) \
+            if self.config.get("use_word_embeddings", True) and paired_items else None
+        for fine_tuner in self.fine_tuners:
+            item_pairs = fine_tuner.refine(item_pairs, words_embeddings_dict)
+        print(f"Total pairs for {len(new_items)} new items: {len(item_pairs)}")
+        return item_pairs
+
+    def set_progress_callback(self, progress_callback):
+        """
+        Sets a callable(stage, done, total) reporting embedding and pair scoring progress, or None to disable it.
+        """
+        for segment in [self.pre_classifier, *self.fine_tuners]:
+            segment.progress_callback = progress_callback
+
     def set_data_loader(self, data_loader):
         self.data_loader = data_loader
 
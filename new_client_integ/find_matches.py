@@ -10,7 +10,7 @@ from new_client_integ.find_duplicates import FindDuplicates
 from new_client_integ.fine_tuning.refiner import MinimalSimilarityRefiner
 from new_client_integ.matchers.matchers import CosineSimilarityMatcher
 from new_client_integ.pre_classifiers.pre_classifier import EmbeddingClassifier
-from new_client_integ.utils import clean_text
+from new_client_integ.utils import clean_text, group_by_canonical_key
 from scan_text_recipes.utils.utils import read_yaml
 
 
@@ -32,6 +32,10 @@ class FindMatches(FindDuplicates):
         self.matcher = CosineSimilarityMatcher(**config['MATCHER'])
         self.fine_tuner = MinimalSimilarityRefiner(**config["FINE_TUNNER"])
 
+    def set_progress_callback(self, progress_callback):
+        for segment in [self.pre_classifier, self.fine_tuner]:
+            segment.progress_callback = progress_callback
+
     @property
     def inventory(self):
         return self._inventory if self._inventory is not None else pd.DataFrame()
@@ -50,10 +54,25 @@ class FindMatches(FindDuplicates):
     ) -> [pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """
         Compare client inventory to known inventory using cosine similarity.
+        If "canonicalize" is enabled, matching runs once per canonical key (on the first original item having it)
+        and the results are fanned out to every original client item sharing it.
 
         Returns a sorted DataFrame:
         | client_item | inventory_match | similarity_score |
         """
+        if not self.config.get("canonicalize", False):
+            return self.match_items(client_inventory_list)
+        groups = {variants[0]: variants for variants in group_by_canonical_key(client_inventory_list).values()}
+        key_matches = self.match_items(list(groups))
+        return [
+            {**match, "client_item": item}
+            for match in key_matches for item in groups[match["client_item"]]
+        ]
+
+    def match_items(self, client_inventory_list: List[str]) -> List[Dict]:
+        """
+        Match every client item against the inventory, sorted by best score.
+        """
         # 🔹 Embed both sets
         emb_inventory = self.pre_classifier.embed_ingredients(tuple(self.inventory['_name']))
         emb_client = self.pre_classifier.embed_ingredients(tuple(client_inventory_list))
@@ -78,6 +97,7 @@ class FindMatches(FindDuplicates):
 
         results = []
         for i in range(similarity_matrix.size(0)):
+            self.pre_classifier.report_progress("matching items", i + 1, similarity_matrix.size(0))
             row = similarity_matrix[i].cpu()
             # ✅ Get top-2 indices and scores
             top_scores, top_indices = torch.topk(row, 10)
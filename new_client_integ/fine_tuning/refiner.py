@@ -61,13 +61,15 @@ class MinimalSimilarityRefiner(BaseRefiner, EmbeddingClassifier):
         Refine the data based on similarity scores.
         """
         items = []
-        for pair in data:
+        for k, pair in enumerate(data, start=1):
             # Assuming pair is a tuple of (score, ing1, ing2, index1, index2)
             ing1, ing2, _, idx1, idx2 = pair
             inj1_words = self.split_words(ing1)
             inj2_words = self.split_words(ing2)
             new_score = self.gen_score(inj1_words, inj2_words, emb_dict)
             items.append((ing1, ing2, new_score, idx1, idx2))
+            if k % 1000 == 0 or k == len(data):
+                self.report_progress("scoring pairs", k, len(data))
         return items
 
     def refine(self, data: List[Tuple[str, str, float, int, int]], emb_dict: Dict = None) -> List[Tuple[str, str, float, int, int]]:
@@ -0,0 +1,156 @@
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from new_client_integ.utils import orthographic_signatures, hebrew_orthographic_key, canonical_key
+
+
+class OrthographicKeyIndex:
+    """
+    Blocking index keyed on Hebrew-aware orthographic signatures.
+    Every item is indexed under the signature of each of its words and under the signature of the whole item,
+    so items sharing a (normalized) word land in the same block. Candidate pairs are generated inside blocks only,
+    which is near-linear in the number of items instead of the full N x N comparison.
+    Blocks of very common words (e.g. 40 kinds of "פלפל") larger than max_block_size are skipped,
+    the whole item signature blocks are always used.
+    """
+    ITEM_SIGNATURE_PREFIX = "="
+
+    def __init__(self, max_block_size: int = 100, min_signature_length: int = 2):
+        self.max_block_size = max_block_size
+        self.min_signature_length = min_signature_length
+        self.items: List[str] = []
+        self.item_keys: List[str] = []
+        self.blocks: Dict[str, List[int]] = defaultdict(list)
+
+    def item_key(self, item: str) -> str:
+        return self.ITEM_SIGNATURE_PREFIX + " ".join(hebrew_orthographic_key(word) for word in item.split())
+
+    def item_signatures(self, item: str) -> Set[str]:
+        signatures = {self.item_key(item)}
+        for word in item.split():
+            signatures.update(
+                signature for signature in orthographic_signatures(word)
+                if len(signature) >= self.min_signature_length
+            )
+        return signatures
+
+    def build(self, items: List[str]) -> "OrthographicKeyIndex":
+        self.items = list(items)
+        self.item_keys = [self.item_key(item) for item in self.items]
+        self.blocks = defaultdict(list)
+        for idx, item in enumerate(self.items):
+            for signature in self.item_signatures(item):
+                self.blocks[signature].append(idx)
+        return self
+
+    def is_usable_block(self, signature: str, members: List[int]) -> bool:
+        return signature.startswith(self.ITEM_SIGNATURE_PREFIX) or len(members) <= self.max_block_size
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        """
+        Returns all pairs (i, j), i < j, of item indices sharing at least one usable block.
+        """
+        pairs = set()
+        for signature, members in self.blocks.items():
+            if len(members) < 2 or not self.is_usable_block(signature, members):
+                continue
+            for a, idx_a in enumerate(members):
+                for idx_b in members[a + 1:]:
+                    pairs.add((min(idx_a, idx_b), max(idx_a, idx_b)))
+        return pairs
+
+    def query(self, item: str) -> Set[int]:
+        """
+        Returns indices of indexed items sharing at least one usable block with the given item,
+        e.g. to block client items against an indexed inventory.
+        """
+        candidates = set()
+        for signature in self.item_signatures(item):
+            members = self.blocks.get(signature, [])
+            if self.is_usable_block(signature, members):
+                candidates.update(members)
+        return candidates
+
+    def same_signature(self, i: int, j: int) -> bool:
+        return self.item_keys[i] == self.item_keys[j]
+
+
+class MinHashLSHIndex:
+    """
+    Banded MinHash LSH over character n-grams.
+    Each item gets a signature of num_perm MinHash values, split into bands of num_perm / bands rows;
+    two items collide if all rows of at least one band are equal. With r rows per band, items with Jaccard
+    similarity s collide with probability 1 - (1 - s^r)^bands, so more bands favour recall, more rows precision.
+    Buckets larger than max_bucket_size (degenerate, very short names) are skipped.
+    """
+    MERSENNE_PRIME = (1 << 31) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, ngram: int = 3, max_bucket_size: int = 200, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_bucket_size = max_bucket_size
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, self.MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.perm_b = rng.integers(0, self.MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint64)
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+
+    def shingles(self, item: str) -> Set[int]:
+        text = f" {canonical_key(item)} "
+        if len(text) <= self.ngram:
+            return {zlib.crc32(text.encode("utf-8"))}
+        return {zlib.crc32(text[k:k + self.ngram].encode("utf-8")) for k in range(len(text) - self.ngram + 1)}
+
+    def signature(self, item: str) -> np.ndarray:
+        hashes = np.fromiter(self.shingles(item), dtype=np.uint64)
+        # (a * x + b) mod p for every permutation (rows) and shingle (columns), minimum over shingles
+        permuted = (np.outer(self.perm_a, hashes) + self.perm_b[:, None]) % self.MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def build(self, items: List[str]) -> "MinHashLSHIndex":
+        self.signatures = np.stack([self.signature(item) for item in items]) if items else self.signatures[:0]
+        self.buckets = defaultdict(list)
+        for idx, signature in enumerate(self.signatures):
+            for key in self.band_keys(signature):
+                self.buckets[key].append(idx)
+        return self
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        """
+        Returns all pairs (i, j), i < j, of item indices colliding in at least one band bucket.
+        """
+        pairs = set()
+        for members in self.buckets.values():
+            if len(members) < 2 or len(members) > self.max_bucket_size:
+                continue
+            for a, idx_a in enumerate(members):
+                for idx_b in members[a + 1:]:
+                    pairs.add((idx_a, idx_b))
+        return pairs
+
+    def query(self, item: str) -> Set[int]:
+        """
+        Returns indices of indexed items colliding with the given item in at least one band bucket.
+        """
+        candidates = set()
+        for key in self.band_keys(self.signature(item)):
+            members = self.buckets.get(key, [])
+            if len(members) <= self.max_bucket_size:
+                candidates.update(members)
+        return candidates
+
+    def estimated_similarity(self, i: int, j: int) -> float:
+        """
+        Estimated Jaccard similarity of the n-gram sets of items i and j.
+        """
+        return float(np.mean(self.signatures[i] == self.signatures[j]))
@@ -1,9 +1,10 @@
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Set
 
 import torch
 import torch.nn.functional as F
-from transformers import AutoTokenizer, AutoModel
 
+from new_client_integ.pre_classifiers.blocking_indices import OrthographicKeyIndex, MinHashLSHIndex
+from new_client_integ.resources import embedding_tokenizer_lock, get_embedding_backbone
 from new_client_integ.utils import conditional_cache
 
 
@@ -18,10 +19,15 @@ class BaseClassifier:
 
 class PairCandidateGenerator(BaseClassifier):
     similarity_matrix = None
+    progress_callback = None  # optional callable(stage, done, total), e.g. a background job's progress reporter
 
     def __init__(self, config: Dict = None):
         self.config = config
 
+    def report_progress(self, stage: str, done: int, total: int):
+        if self.progress_callback is not None:
+            self.progress_callback(stage, done, total)
+
     @staticmethod
     def get_similar_pairs(sim_matrix: torch.Tensor, ing_names: List[str], threshold=0.8):
         """
@@ -49,6 +55,54 @@ class PairCandidateGenerator(BaseClassifier):
 
         return sim_pairs
 
+    @staticmethod
+    def get_knn_pairs(
+            embeddings: torch.Tensor, ing_names: List[str], k: int = 5, threshold: float = 0.8,
+            mutual: bool = False, relative_margin: float = None, block_size: int = 1024
+    ):
+        """
+        kNN graph alternative to get_similar_pairs: every item keeps only its k nearest neighbours,
+        so the number of pairs is bounded by N * k even in dense regions.
+        Similarities are computed blockwise (block_size rows at a time), never materializing the N x N matrix.
+        A neighbour is kept if its score is above threshold and, if relative_margin is given, within relative_margin
+        of the item's best neighbour (per-item adaptive cutoff). With mutual=True, a pair is kept only if each item
+        is among the kept neighbours of the other.
+        """
+        n_items = embeddings.shape[0]
+        k = min(k, n_items - 1)
+        if k < 1:
+            return []
+
+        knn_scores, knn_indices = [], []
+        for start in range(0, n_items, block_size):
+            end = min(start + block_size, n_items)
+            block_sim = torch.matmul(embeddings[start:end], embeddings.T)  # (B, D) @ (D, N) = (B, N)
+            rows = torch.arange(end - start, device=block_sim.device)
+            block_sim[rows, rows + start] = float("-inf")  # an item is not its own neighbour
+            scores, indices = block_sim.topk(k, dim=1)
+            knn_scores.append(scores)
+            knn_indices.append(indices)
+        knn_scores = torch.cat(knn_scores).cpu()
+        knn_indices = torch.cat(knn_indices).cpu()
+
+        keep = knn_scores > threshold
+        if relative_margin is not None:
+            keep &= knn_scores >= knn_scores[:, :1] - relative_margin
+
+        edges = {}
+        for i, j in torch.nonzero(keep, as_tuple=False).tolist():
+            edges[(i, int(knn_indices[i, j]))] = float(knn_scores[i, j])
+
+        sim_pairs = []
+        for (i, j), score in sorted(edges.items()):
+            if mutual and (j, i) not in edges:
+                continue
+            if i > j and (j, i) in edges:  # already added from the other direction
+                continue
+            i, j = min(i, j), max(i, j)
+            sim_pairs.append((ing_names[i], ing_names[j], score, i, j))
+        return sim_pairs
+
     def classify(self, items: List[str], **kwargs) -> List[Tuple[str, str]]:
         return []
 
@@ -59,6 +113,7 @@ class EmbeddingClassifier(PairCandidateGenerator):
         self.device = 'cuda' if torch.cuda.is_available() and device == 'cuda' else 'cpu'
         self.embedding_model = None
         self.tokenizer = None
+        self.tokenizer_lock = None
         self._use_cache = use_cache
         self.load_embedding_model()
 
@@ -68,10 +123,11 @@ class EmbeddingClassifier(PairCandidateGenerator):
         :return:
         """
         if self.embedding_model is None:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.config["embedding_params"]["MODEL_NAME"])
-            self.embedding_model = AutoModel.from_pretrained(self.config["embedding_params"]["MODEL_NAME"])
+            self.tokenizer, self.embedding_model = get_embedding_backbone(
+                self.config["embedding_params"]["MODEL_NAME"], self.device
+            )
+            self.tokenizer_lock = embedding_tokenizer_lock(self.config["embedding_params"]["MODEL_NAME"], self.device)
             print(f"{self.__class__.__name__}: Using device: ", self.device)
-            self.embedding_model = self.embedding_model.to(self.device)
 
     def embed_ingredients(self, items: Tuple[str]) -> torch.Tensor:
         """
@@ -92,8 +148,20 @@ class EmbeddingClassifier(PairCandidateGenerator):
     def _embed_ingredients(self, items: Tuple[str]) -> torch.Tensor:
         """
         Given a list of items, returns their embeddings.
+        Items are embedded in batches of embedding_params BATCH_SIZE, reporting progress after each batch.
         """
-        inputs = self.tokenizer(items, padding=True, truncation=True, return_tensors="pt", max_length=128)
+        if not items:
+            return torch.empty((0, self.embedding_model.config.hidden_size), device=self.device)
+        batch_size = self.config["embedding_params"].get("BATCH_SIZE", 256)
+        batches = []
+        for start in range(0, len(items), batch_size):
+            batches.append(self._embed_batch(list(items[start:start + batch_size])))
+            self.report_progress("embedding", min(start + batch_size, len(items)), len(items))
+        return torch.cat(batches)
+
+    def _embed_batch(self, items: List[str]) -> torch.Tensor:
+        with self.tokenizer_lock:  # the tokenizer is shared by concurrent jobs
+            inputs = self.tokenizer(items, padding=True, truncation=True, return_tensors="pt", max_length=128)
         inputs = {k: v.to(self.device) for k, v in inputs.items()}  # move tokenized inputs to model's device
         with torch.no_grad():
             outputs = self.embedding_model(**inputs)
@@ -111,26 +179,86 @@ class EmbeddingClassifier(PairCandidateGenerator):
         Fast PCA on GPU using PyTorch SVD.
         X: Tensor of shape (n_samples, n_features)
         """
-        X_mean = in_tnsor.mean(dim=0, keepdim=True)
+        X_mean, components = EmbeddingClassifier.fit_pca(in_tnsor, n_components)
         print(f"X_mean on: {X_mean.device}")
-        X_centered = in_tnsor - X_mean
-        U, S, Vh = torch.linalg.svd(X_centered, full_matrices=False)
-        return torch.matmul(X_centered, Vh[:n_components].T)
+        return torch.matmul(in_tnsor - X_mean, components.T)
 
-    def classify(self, items: List[str], **kwargs) -> List[Tuple[str, str, float, int, int]]:
+    @staticmethod
+    def fit_pca(in_tnsor: torch.Tensor, n_components: int) -> Tuple[torch.Tensor, torch.Tensor]:
         """
-        Given a list of items, returns a list of tuples with similar pairs and their similarity scores.
-        Each tuple contains (item1, item2, score, index1, index2)
+        Fits PCA, returns the mean (1, n_features) and the principal components (n_components, n_features),
+        so that new samples can be projected onto the same space later.
+        """
+        X_mean = in_tnsor.mean(dim=0, keepdim=True)
+        U, S, Vh = torch.linalg.svd(in_tnsor - X_mean, full_matrices=False)
+        return X_mean, Vh[:n_components]
+
+    def pca_components(self) -> Optional[int]:
+        """
+        Number of PCA components the embeddings are reduced to, None if PCA is disabled (enabled by default).
+        Shared by the batch and the incremental (index) paths, so both embed into the same space.
+        """
+        if not self.config["embedding_params"].get("PCA", True):
+            return None
+        return self.config["embedding_params"].get("PCA_COMPONENTS", 50)
+
+    def get_embeddings(self, items: List[str]) -> torch.Tensor:
+        """
+        Given a list of items, returns their normalized embeddings, reduced by PCA if configured.
         """
         embeddings = self.embed_ingredients(tuple(items))  # normalized embeddings on GPU
 
         # Optionally apply PCA
-        if self.config["embedding_params"].get("PCA", True):
-            n_components = self.config["embedding_params"].get("PCA_COMPONENTS", 50)
+        n_components = self.pca_components()
+        if n_components is not None:
             embeddings = self.torch_pca(embeddings, n_components)
             print(f"embeddings post-pca on: {embeddings.device}")
             embeddings = F.normalize(embeddings, p=2, dim=1)
             print(f"embeddings post-normalization on: {embeddings.device}")
+        return embeddings
+
+    def score_candidate_pairs(
+            self, items: List[str], candidate_pairs: Set[Tuple[int, int]], keep: Set[Tuple[int, int]] = None
+    ) -> List[Tuple[str, str, float, int, int]]:
+        """
+        Scores only the given candidate pairs of item indices, embedding only the items that take part in them.
+        Pairs scoring above the threshold, or listed in keep, are returned as (item1, item2, score, index1, index2).
+        """
+        if not candidate_pairs:
+            return []
+        keep = keep if keep is not None else set()
+        idx_i, idx_j = zip(*sorted(candidate_pairs))
+        involved = sorted(set(idx_i) | set(idx_j))
+        position = {item_idx: pos for pos, item_idx in enumerate(involved)}
+        embeddings = self.get_embeddings([items[k] for k in involved])
+
+        rows = torch.tensor([position[i] for i in idx_i], device=embeddings.device)
+        cols = torch.tensor([position[j] for j in idx_j], device=embeddings.device)
+        scores = (embeddings[rows] * embeddings[cols]).sum(dim=1).cpu()
+
+        return [
+            (items[i], items[j], float(score), i, j)
+            for i, j, score in zip(idx_i, idx_j, scores)
+            if score > self.config["THRESHOLD"] or (i, j) in keep
+        ]
+
+    def classify(self, items: List[str], **kwargs) -> List[Tuple[str, str, float, int, int]]:
+        """
+        Given a list of items, returns a list of tuples with similar pairs and their similarity scores.
+        Each tuple contains (item1, item2, score, index1, index2)
+        """
+        embeddings = self.get_embeddings(items)
+
+        if self.config.get("KNN"):
+            knn_config = self.config["KNN"]
+            return self.get_knn_pairs(
+                embeddings, items,
+                k=knn_config.get("K", 5),
+                threshold=self.config["THRESHOLD"],
+                mutual=knn_config.get("MUTUAL", False),
+                relative_margin=knn_config.get("RELATIVE_MARGIN"),
+                block_size=knn_config.get("BLOCK_SIZE", 1024),
+            )
 
         # Compute full cosine similarity matrix on GPU
         similarity_matrix = torch.matmul(embeddings, embeddings.T)  # (N, D) @ (D, N) = (N, N)
@@ -142,6 +270,94 @@ class EmbeddingClassifier(PairCandidateGenerator):
         sim_pairs = self.get_similar_pairs(similarity_matrix, items, threshold=self.config["THRESHOLD"])
         return sim_pairs
 
+    def build_index(self, items: List[str]) -> Dict:
+        """
+        Builds a reusable index of an already deduplicated catalog: the catalog items, their embeddings and
+        the fitted PCA (if configured), so that new items can later be projected onto the same space.
+        """
+        embeddings = self.embed_ingredients(tuple(items))
+        index = {"items": list(items), "pca_mean": None, "pca_components": None}
+        n_components = self.pca_components()
+        if n_components is not None:
+            index["pca_mean"], index["pca_components"] = self.fit_pca(embeddings, n_components)
+            embeddings = F.normalize(torch.matmul(embeddings - index["pca_mean"], index["pca_components"].T), p=2, dim=1)
+        index["embeddings"] = embeddings
+        return index
+
+    @staticmethod
+    def save_index(index: Dict, path: str):
+        torch.save({key: value.cpu() if isinstance(value, torch.Tensor) else value for key, value in index.items()}, path)
+
+    def load_index(self, path: str) -> Dict:
+        index = torch.load(path, map_location=self.device)
+        print(f"{self.__class__.__name__}: loaded index of {len(index['items'])} items from {path}")
+        return index
+
+    def classify_against(self, new_items: List[str], index: Dict) -> List[Tuple[str, str, float, int, int]]:
+        """
+        Incremental classification: compares only new items against the indexed catalog and against each other.
+        Indices in the returned pairs refer to index["items"] + new_items, catalog-vs-catalog pairs are never emitted.
+        """
+        if not new_items:
+            return []
+        embeddings = self.embed_ingredients(tuple(new_items))
+        if index["pca_mean"] is not None:
+            pca_mean = index["pca_mean"].to(embeddings.device)
+            pca_components = index["pca_components"].to(embeddings.device)
+            embeddings = F.normalize(torch.matmul(embeddings - pca_mean, pca_components.T), p=2, dim=1)
+
+        catalog_items = index["items"]
+        offset = len(catalog_items)
+        threshold = self.config["THRESHOLD"]
+        sim_pairs = []
+
+        # new vs existing
+        if catalog_items:
+            similarity_matrix = torch.matmul(embeddings, index["embeddings"].to(embeddings.device).T)  # (n_new, N)
+            idx_new, idx_old = torch.nonzero(similarity_matrix > threshold, as_tuple=True)
+            for new_idx, old_idx, score in zip(idx_new.tolist(), idx_old.tolist(), similarity_matrix[idx_new, idx_old].tolist()):
+                sim_pairs.append((catalog_items[old_idx], new_items[new_idx], score, old_idx, offset + new_idx))
+
+        # new vs new
+        similarity_matrix = torch.matmul(embeddings, embeddings.T)
+        similarity_matrix.fill_diagonal_(0)
+        for item1, item2, score, i, j in self.get_similar_pairs(similarity_matrix, new_items, threshold=threshold):
+            sim_pairs.append((item1, item2, score, offset + i, offset + j))
+        return sim_pairs
+
+
+class OrthographicBlockingClassifier(EmbeddingClassifier):
+    """
+    Generates candidate pairs from a Hebrew orthographic blocking index (spelling variants such as
+    ז'לטין / ג'לטין or בזילקום / בזיליקום share a block), and scores only those pairs with embeddings,
+    instead of computing the full N x N similarity matrix.
+    Pairs with identical orthographic signature are kept even if their embedding score is below the threshold.
+    """
+    def classify(self, items: List[str], **kwargs) -> List[Tuple[str, str, float, int, int]]:
+        index = OrthographicKeyIndex(**self.config.get("blocking_params", {})).build(items)
+        candidate_pairs = index.candidate_pairs()
+        same_signature = {(i, j) for i, j in candidate_pairs if index.same_signature(i, j)}
+        print(f"{self.__class__.__name__}: {len(candidate_pairs)} candidate pairs for {len(items)} items")
+        return self.score_candidate_pairs(items, candidate_pairs, keep=same_signature)
+
+
+class MinHashLSHClassifier(EmbeddingClassifier):
+    """
+    Generates candidate pairs from MinHash signatures over character n-grams with banded LSH,
+    and scores only the colliding pairs with embeddings. Candidate generation is linear in the number of items,
+    which makes catalog-scale (hundreds of thousands of rows) duplicate detection feasible.
+    """
+    def classify(self, items: List[str], **kwargs) -> List[Tuple[str, str, float, int, int]]:
+        index = MinHashLSHIndex(
+            num_perm=self.config.get("NUM_PERM", 64),
+            bands=self.config.get("BANDS", 16),
+            ngram=self.config.get("NGRAM", 3),
+            max_bucket_size=self.config.get("MAX_BUCKET_SIZE", 200),
+        ).build(items)
+        candidate_pairs = index.candidate_pairs()
+        print(f"{self.__class__.__name__}: {len(candidate_pairs)} candidate pairs for {len(items)} items")
+        return self.score_candidate_pairs(items, candidate_pairs)
+
 
 if __name__ == '__main__':
     cfg = {
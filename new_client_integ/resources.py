@@ -0,0 +1,94 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+import stanza
+from transformers import AutoTokenizer, AutoModel
+
+
+def config_hash(cfg: Any) -> str:
+    """
+    Stable hash of a (json-like) configuration.
+    """
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResourceRegistry:
+    """
+    Process-wide registry of expensive resources (models, engines), shared across Streamlit reruns and sessions.
+    Every resource is registered under a name together with the hash of the config it was built with;
+    requesting the same name with a different config evicts the old resource and builds a new one.
+    Resources that keep state between calls (e.g. engines) should be used under lock(name).
+    """
+    def __init__(self):
+        self._resources: Dict[str, Tuple[str, Any]] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._registry_lock = threading.Lock()
+
+    def lock(self, name: str) -> threading.RLock:
+        with self._registry_lock:
+            return self._locks.setdefault(name, threading.RLock())
+
+    def get(self, name: str, cfg: Any, factory: Callable[[], Any]) -> Any:
+        cfg_hash = config_hash(cfg)
+        with self.lock(name):
+            cached = self._resources.get(name)
+            if cached is not None and cached[0] == cfg_hash:
+                return cached[1]
+            if cached is not None:
+                print(f"{self.__class__.__name__}: config of '{name}' changed, evicting")
+                self.evict(name)
+            resource = factory()
+            self._resources[name] = (cfg_hash, resource)
+            return resource
+
+    def evict(self, name: str):
+        with self.lock(name):
+            self._resources.pop(name, None)
+
+    def clear(self):
+        for name in list(self._resources):
+            self.evict(name)
+
+
+RESOURCES = ResourceRegistry()
+
+
+def get_engine(engine_cls, cfg: Dict):
+    """
+    Returns the engine (e.g. FindMatches) built with cfg, building it only on first use
+    or when cfg changed. Use it under engine_lock(engine_cls), engines keep state between calls.
+    """
+    return RESOURCES.get(engine_cls.__name__, cfg, lambda: engine_cls(cfg=cfg))
+
+
+def engine_lock(engine_cls) -> threading.RLock:
+    return RESOURCES.lock(engine_cls.__name__)
+
+
+def get_embedding_backbone(model_name: str, device: str):
+    """
+    Returns the (tokenizer, model) pair of a HuggingFace embedding model, loaded once per process and device.
+    The model is used for inference only and may be shared by several classifiers and refiners.
+    """
+    def load():
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).to(device)
+        model.eval()
+        return tokenizer, model
+    return RESOURCES.get(f"embedding_backbone:{model_name}:{device}", None, load)
+
+
+def embedding_tokenizer_lock(model_name: str, device: str) -> threading.RLock:
+    """
+    Lock of the tokenizer of get_embedding_backbone: HuggingFace fast tokenizers are not thread safe
+    ("Already borrowed"), so concurrent jobs tokenize one at a time. The model itself is shared without a lock.
+    """
+    return RESOURCES.lock(f"embedding_tokenizer:{model_name}:{device}")
+
+
+def get_stanza_pipeline(language: str):
+    return RESOURCES.get(
+        f"stanza:{language}", None, lambda: stanza.Pipeline(lang=language, processors='tokenize,mwt,pos,lemma')
+    )
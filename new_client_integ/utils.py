@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Set
 import pandas as pd
 from functools import lru_cache
 import difflib
@@ -8,6 +8,17 @@ import difflib
 # Determine if cache should be used (e.g., skip caching in AWS Lambda)
 USE_CACHE = os.getenv('USE_CACHE', '1') == '1'
 
+# Hebrew geresh/gershayim and typographic quotes, unified to plain ASCII quotes
+QUOTES_TRANSLATION = str.maketrans({
+    "\u05F3": "'", "\u2019": "'", "\u2018": "'", "`": "'", "\u00B4": "'",
+    "\u05F4": '"', "\u201C": '"', "\u201D": '"', "\u201E": '"',
+})
+
+# Final forms are spelling, not pronunciation: ך->כ, ם->מ, ן->נ, ף->פ, ץ->צ
+HEBREW_FINAL_LETTERS = str.maketrans("\u05DA\u05DD\u05DF\u05E3\u05E5", "\u05DB\u05DE\u05E0\u05E4\u05E6")
+# Conjunction and definite article prefixes: וה, ו, ה
+HEBREW_PREFIXES = ("\u05D5\u05D4", "\u05D5", "\u05D4")
+
 
 def highlight_differences(a: str, b: str) -> Tuple[str, str]:
     seq = difflib.SequenceMatcher(None, a, b)
@@ -53,13 +64,71 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
+def canonical_key(text: str) -> str:
+    """
+    Maps an item name to a canonical key, so that names which differ only in punctuation separators, whitespace,
+    quote style (geresh vs apostrophe), casing or Hebrew final letters share the same key.
+    Digits and unit symbols (%, /) are kept, so "חלב 3%" and "חלב 1%" stay different items.
+    """
+    text = str(text).translate(QUOTES_TRANSLATION).replace("''", '"')
+    text = text.translate(HEBREW_FINAL_LETTERS)
+    # Step 1: Punctuation separates words, but carries no meaning of its own (except a decimal point or comma)
+    text = re.sub(r"[.,](?!\d)|(?<!\d)[.,]|[\-\u2013\u2014_()\[\]{}:;!?*|\\]", " ", text)
+    # Step 2: Collapse spaces and unify casing
+    text = re.sub(r"\s+", " ", text)
+    return text.strip().lower()
+
+
+def group_by_canonical_key(items: List[str]) -> Dict[str, List[str]]:
+    """
+    Groups items by their canonical key, preserving the order of first appearance.
+    Items whose canonical key is empty are grouped by their stripped text instead.
+
+    Returns:
+        dict: canonical key -> list of original items sharing it.
+    """
+    groups = {}
+    for item in items:
+        key = canonical_key(item) or str(item).strip()
+        groups.setdefault(key, []).append(item)
+    return groups
+
+
+def hebrew_orthographic_key(word: str) -> str:
+    """
+    Orthographic signature of a single word, shared by common Hebrew spelling variants:
+    final letters are unified, ז' and ג' (both used for the "j" sound in loanwords) are unified,
+    geresh marks are dropped, and the matres lectionis ו/י are stripped (plene vs defective spelling),
+    except as the first letter of the word.
+    """
+    word = canonical_key(word).replace(" ", "")
+    word = word.translate(HEBREW_FINAL_LETTERS)
+    word = word.replace("\u05D6'", "\u05D2'")
+    word = re.sub(r"[\"']", "", word)
+    return word[:1] + re.sub("[\u05D5\u05D9]", "", word[1:])
+
+
+def orthographic_signatures(word: str, min_stem_length: int = 3) -> Set[str]:
+    """
+    All orthographic signatures of a word: the word itself, and the word without
+    a common prefix (ו, ה, וה) as long as at least min_stem_length letters remain.
+    """
+    signatures = {hebrew_orthographic_key(word)}
+    for prefix in HEBREW_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= min_stem_length:
+            signatures.add(hebrew_orthographic_key(word[len(prefix):]))
+    signatures.discard("")
+    return signatures
+
+
 def select_rows_by_dict(df, selection: Dict[str, Any]) -> pd.DataFrame:
     """
     Select rows from a DataFrame based on column-value pairs.
 
     Args:
         df (pd.DataFrame): The DataFrame to filter.
-        selection (dict): Dictionary where keys are column names and values are the required values.
+        selection (dict): Dictionary where keys are column names and values are the required value,
+            or a list of allowed values.
 
     Returns:
         pd.DataFrame: Filtered DataFrame.
@@ -67,5 +136,5 @@ def select_rows_by_dict(df, selection: Dict[str, Any]) -> pd.DataFrame:
     mask = pd.Series(True, index=df.index)
     for col, val in selection.items():
         if col in df.columns:
-            mask &= (df[col] == val)
+            mask &= df[col].isin(val) if isinstance(val, (list, tuple, set)) else (df[col] == val)
     return df[mask]
@@ -0,0 +1,236 @@
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# Add the repo root (parent of client_boarding) to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scan_text_recipes.utils.paths import PROJECT_ROOT
+from scan_text_recipes.src.model_interface.token_counter import TokenCounter
+from scan_text_recipes.utils.utils import read_yaml
+
+DEFAULT_FIXTURES_DIR = os.path.join(PROJECT_ROOT, "tests")
+STREAM_CHUNK_CHARS = 16
+
+
+def load_fixtures(fixtures_dir: str = DEFAULT_FIXTURES_DIR) -> Dict[str, Dict]:
+    """
+    The structured recipes (*.yaml with ingredients) of fixtures_dir, by dish name.
+    """
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.yaml"))):
+        recipe = read_yaml(path)
+        if isinstance(recipe, dict) and "ingredients" in recipe:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = recipe
+    return fixtures
+
+
+class CannedResponses:
+    """
+    Answers chat requests of the pipeline stages with canned responses derived from the test recipes.
+    The recipe is chosen by the ingredient names found in the request, the answer by the kind of request:
+      - structuring and full graph refinement - the structured test recipe
+      - patch responses (see recipe_patch) - an empty patch
+      - supplementary fixers - one empty answer per question
+      - text answers (e.g. simplification) - the recipe text of the request
+    """
+    def __init__(self, fixtures: Dict[str, Dict]):
+        if not fixtures:
+            raise ValueError("No structured recipe fixtures found")
+        self.fixtures = fixtures
+
+    def match_recipe(self, prompt: str) -> Dict:
+        return max(
+            self.fixtures.values(),
+            key=lambda recipe: sum(str(node.get("name")) in prompt for node in recipe["ingredients"])
+        )
+
+    @staticmethod
+    def request_kind(prompt: str) -> str:
+        if "patch operations" in prompt:
+            return "patch"
+        if "Provide answers to next questions" in prompt:
+            return "questions"
+        if "JSON" in prompt:
+            return "recipe"
+        return "text"
+
+    def answer(self, messages: List[Dict]) -> [str, str]:
+        prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        kind = self.request_kind(prompt)
+        if kind == "patch":
+            return kind, "[]"
+        if kind == "questions":
+            questions = re.findall(r"^\s*Question: ", prompt, flags=re.MULTILINE)
+            return kind, json.dumps([{"name": "", "value": "", "units": ""} for _ in questions], ensure_ascii=False)
+        if kind == "recipe":
+            return kind, json.dumps(self.match_recipe(prompt), ensure_ascii=False)
+        user_messages = [message.get("content") or "" for message in messages if message.get("role") == "user"]
+        return kind, user_messages[-1] if user_messages else ""
+
+
+class MockModelServer:
+    """
+    Local OpenAI-compatible chat completions server (POST .../chat/completions, streamed or not),
+    replaying canned responses after latency seconds (plus up to jitter seconds), and generating
+    output_tokens_per_second tokens per second if set. Serves in a background thread, see start and stop.
+    """
+    def __init__(
+            self, host: str = "127.0.0.1", port: int = 0, fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+            latency: float = 0.0, jitter: float = 0.0, output_tokens_per_second: float = None
+    ):
+        self.responses = CannedResponses(load_fixtures(fixtures_dir))
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens_per_second = output_tokens_per_second
+        self.token_counter = TokenCounter.for_model()
+        self.stats = defaultdict(int)
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.handle_completion(self, body)
+
+            def send_json(self, status: int, payload: Dict):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def count_usage(self, kind: str, usage: Dict):
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats[f"requests.{kind}"] += 1
+            self.stats["prompt_tokens"] += usage["prompt_tokens"]
+            self.stats["completion_tokens"] += usage["completion_tokens"]
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats.clear()
+
+    def generation_time(self, completion_tokens: int) -> float:
+        return completion_tokens / self.output_tokens_per_second if self.output_tokens_per_second else 0.0
+
+    def handle_completion(self, handler: BaseHTTPRequestHandler, body: Dict):
+        messages = body.get("messages", [])
+        kind, content = self.responses.answer(messages)
+        usage = {
+            "prompt_tokens": self.token_counter.count_messages(messages),
+            "completion_tokens": self.token_counter.count(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.count_usage(kind, usage)
+        completion_id, created, model = f"chatcmpl-{uuid.uuid4().hex}", int(time.time()), body.get("model", "mock")
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if not body.get("stream"):
+            time.sleep(self.generation_time(usage["completion_tokens"]))
+            return handler.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }],
+                "usage": usage,
+            })
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        pieces = [content[idx:idx + STREAM_CHUNK_CHARS] for idx in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        piece_delay = self.generation_time(usage["completion_tokens"]) / len(pieces)
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        try:
+            for idx, piece in enumerate(pieces):
+                time.sleep(piece_delay)
+                finish_reason = "stop" if idx == len(pieces) - 1 else None
+                self.send_event(handler, {**chunk, "choices": [
+                    {"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": finish_reason}
+                ]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self.send_event(handler, {**chunk, "choices": [], "usage": usage})
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client closed the stream, e.g. an aborted malformed answer
+
+    @staticmethod
+    def send_event(handler: BaseHTTPRequestHandler, payload: Dict):
+        handler.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        handler.wfile.flush()
+
+    def start(self) -> "MockModelServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-model-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockModelServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock model server replaying the test recipes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--output-tokens-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    mock_server = MockModelServer(
+        args.host, args.port, args.fixtures_dir, args.latency, args.jitter, args.output_tokens_per_second
+    )
+    print(f"Serving mock model on {mock_server.url}")
+    try:
+        mock_server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock_server.httpd.server_close()
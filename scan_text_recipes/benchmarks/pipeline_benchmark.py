@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Add the repo root (parent of client_boarding) to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scan_text_recipes.utils.paths import PROJECT_ROOT
+from scan_text_recipes.benchmarks.mock_model_server import DEFAULT_FIXTURES_DIR, MockModelServer, load_fixtures
+from scan_text_recipes.src.model_interface.remote_model_interface import ModelInterface
+from scan_text_recipes.src.run_pipeline import ReadRecipePipeline
+from scan_text_recipes.utils.utils import read_text, read_yaml, write_yaml
+
+# set while an async stage runs, so its blocking fallback (to_thread(process_recipe)) is not timed twice
+_timing_async_stage = contextvars.ContextVar("timing_async_stage", default=False)
+
+
+class StageTimer:
+    """
+    Wall time of the pipeline stages, by stage class name, recorded by wrapping the process methods of the segments.
+    """
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage_name: str, duration: float):
+        with self._lock:
+            self.durations[stage_name].append(duration)
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+
+    def timed(self, stage_name: str, process):
+        @functools.wraps(process)
+        def wrapper(*args, **kwargs):
+            if _timing_async_stage.get():
+                return process(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return process(*args, **kwargs)
+            finally:
+                self.record(stage_name, time.perf_counter() - start_time)
+        return wrapper
+
+    def atimed(self, stage_name: str, aprocess):
+        @functools.wraps(aprocess)
+        async def wrapper(*args, **kwargs):
+            token = _timing_async_stage.set(True)
+            start_time = time.perf_counter()
+            try:
+                return await aprocess(*args, **kwargs)
+            finally:
+                self.record(stage_name, time.perf_counter() - start_time)
+                _timing_async_stage.reset(token)
+        return wrapper
+
+    def instrument(self, segment):
+        stage_name = segment.__class__.__name__
+        segment.process_recipe = self.timed(stage_name, segment.process_recipe)
+        if asyncio.iscoroutinefunction(getattr(segment, "aprocess_recipe", None)):
+            segment.aprocess_recipe = self.atimed(stage_name, segment.aprocess_recipe)
+        for child in getattr(segment, "processors", []):  # loop containers
+            self.instrument(child)
+
+    def instrument_pipeline(self, pipeline: ReadRecipePipeline):
+        for segment in [*pipeline.pre_processors, pipeline.main_processor, *pipeline.post_processors]:
+            self.instrument(segment)
+        pipeline.save_recipe_to_db = self.timed("DatabaseWrite", pipeline.save_recipe_to_db)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {stage_name: summarize(durations) for stage_name, durations in self.durations.items()}
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "total": sum(ordered),
+    }
+
+
+def write_mock_model_config(server_url: str, directory: str, stream: bool = False) -> str:
+    """
+    Model config pointing to the mock server: no response cache and no client side rate limits,
+    the token budget of the project model config.
+    """
+    model_config = read_yaml(os.path.join(PROJECT_ROOT, "config", "model_config.yaml"))
+    model_config_path = os.path.join(directory, "model_config.yaml")
+    write_yaml({
+        "CURRENT_MODEL": "MOCK",
+        "RESPONSE_CACHE": {"ENABLED": False},
+        "TOKEN_BUDGET_PER_RECIPE": model_config.get("TOKEN_BUDGET_PER_RECIPE"),
+        "MODEL": {
+            "MOCK": {
+                "API_KEY": "mock",
+                "BASE_URL": server_url,
+                "MODEL_NAME": "mock-model",
+                "TOKENIZER_ENCODING": "o200k_base",
+                "TOP_P": 0.97,
+                "TEMPERATURE": 0.1,
+                "LOGPROBS": False,
+                "TOP_LOGPROBS": None,
+                "STREAM": stream,
+                "RETRY": {"MAX_RETRIES": 0},
+            }
+        },
+    }, model_config_path)
+    return model_config_path
+
+
+def write_benchmark_client_config(client_name: str, directory: str, concurrent_post_processors: bool) -> str:
+    """
+    The client config with a dry run database interface (and async model interfaces for concurrent post-processors).
+    """
+    client_config = read_text(os.path.join(PROJECT_ROOT, "client_configs", client_name, "client_config.yaml"))
+    client_config += '\n{% set db_interface_class = "DryRunDatabaseInterface" %}\n'
+    if concurrent_post_processors:
+        client_config += '{% set model_interface_class = "AsyncRemoteAPIModelInterface" %}\n'
+        client_config += '{% set concurrent_post_processors = True %}\n'
+    client_config_path = os.path.join(directory, "client_config.yaml")
+    with open(client_config_path, "w", encoding="utf-8") as f:
+        f.write(client_config)
+    return client_config_path
+
+
+def load_recipe_texts(fixtures_dir: str) -> Dict[str, str]:
+    """
+    The recipe texts of the structured fixtures, so every model answer matches a recipe.
+    """
+    return {
+        dish_name: read_text(os.path.join(fixtures_dir, f"{dish_name}.txt"))
+        for dish_name in load_fixtures(fixtures_dir) if os.path.exists(os.path.join(fixtures_dir, f"{dish_name}.txt"))
+    }
+
+
+def run_level(pipeline: ReadRecipePipeline, recipes: List[tuple], concurrency: int) -> Dict:
+    """
+    Runs (and saves to the dry run database) all recipes, concurrency at a time.
+    """
+    latencies, failures = [], 0
+    latencies_lock = threading.Lock()
+
+    def run_recipe(dish_name: str, recipe_text: str) -> bool:
+        start_time = time.perf_counter()
+        res, recipe_dict = pipeline.run_pipeline(recipe_text)
+        if res:
+            pipeline.save_recipe_to_db(recipe_dict=recipe_dict, recipe_text=recipe_text, dish_name=dish_name)
+        with latencies_lock:
+            latencies.append(time.perf_counter() - start_time)
+        return res
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="benchmark") as executor:
+        for future in [executor.submit(run_recipe, dish_name, recipe_text) for dish_name, recipe_text in recipes]:
+            try:
+                failures += not future.result()
+            except Exception as e:
+                pipeline.logger.error("Benchmark recipe failed: %s", e)
+                failures += 1
+    wall_time = time.perf_counter() - start_time
+    return {
+        "recipes": len(recipes),
+        "failed": failures,
+        "wall_time": wall_time,
+        "recipes_per_second": len(recipes) / wall_time if wall_time else 0.0,
+        "recipe_latency": summarize(latencies) if latencies else {},
+    }
+
+
+def run_benchmark(
+        client_name: str,
+        concurrency_levels: List[int],
+        recipes_per_level: int,
+        latency: float = 0.2,
+        jitter: float = 0.0,
+        output_tokens_per_second: float = None,
+        stream: bool = False,
+        concurrent_post_processors: bool = False,
+        trace_memory: bool = False,
+        fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+) -> Dict:
+    """
+    Runs the full pipeline against the mock model server at every concurrency level.
+    Reports pipeline initialization time (config rendering and plugin discovery), per-stage latency,
+    recipe latency, throughput, model requests and tokens, and peak memory.
+    """
+    recipe_texts = load_recipe_texts(fixtures_dir)
+    recipes = [list(recipe_texts.items())[idx % len(recipe_texts)] for idx in range(recipes_per_level)]
+    results = {"levels": []}
+    with MockModelServer(
+            fixtures_dir=fixtures_dir, latency=latency, jitter=jitter, output_tokens_per_second=output_tokens_per_second
+    ) as server, tempfile.TemporaryDirectory() as config_dir:
+        start_time = time.perf_counter()
+        pipeline = ReadRecipePipeline(
+            write_benchmark_client_config(client_name, config_dir, concurrent_post_processors),
+            model_config_path=write_mock_model_config(server.url, config_dir, stream),
+            client_name=client_name,
+        )
+        results["pipeline_init_seconds"] = time.perf_counter() - start_time
+        stage_timer = StageTimer()
+        stage_timer.instrument_pipeline(pipeline)
+
+        for concurrency in concurrency_levels:
+            ModelInterface.set_max_concurrent_requests(None)
+            stage_timer.reset()
+            server.reset_stats()
+            if trace_memory:
+                tracemalloc.start()
+            level = {"concurrency": concurrency, **run_level(pipeline, recipes, concurrency)}
+            if trace_memory:
+                level["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            level["stages"] = stage_timer.summary()
+            level["model"] = dict(server.stats)
+            # ru_maxrss is in kilobytes on linux (bytes on macOS), and never decreases
+            level["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+            results["levels"].append(level)
+    return results
+
+
+def print_report(results: Dict):
+    print(f"Pipeline initialization: {results['pipeline_init_seconds']:.3f}s")
+    for level in results["levels"]:
+        latency = level["recipe_latency"]
+        print(
+            f"\nConcurrency {level['concurrency']}: {level['recipes']} recipes ({level['failed']} failed) in "
+            f"{level['wall_time']:.2f}s, {level['recipes_per_second']:.2f} recipes/s, "
+            f"recipe latency p50 {latency.get('p50', 0):.3f}s p95 {latency.get('p95', 0):.3f}s"
+        )
+        print(
+            f"  model: {level['model'].get('requests', 0)} requests, {level['model'].get('prompt_tokens', 0)} prompt "
+            f"and {level['model'].get('completion_tokens', 0)} completion tokens; max RSS {level['max_rss_mb']:.1f} MB"
+            + (f", traced peak {level['traced_peak_mb']:.1f} MB" if "traced_peak_mb" in level else "")
+        )
+        for stage_name, stage in sorted(level["stages"].items(), key=lambda item: -item[1]["total"]):
+            print(
+                f"  {stage_name:<36} n={stage['count']:<5} mean {stage['mean'] * 1000:9.2f}ms "
+                f"p50 {stage['p50'] * 1000:9.2f}ms p95 {stage['p95'] * 1000:9.2f}ms"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the recipe pipeline against a local mock model server")
+    parser.add_argument("--client-name", default=os.environ.get("CLIENT_NAME", "italiano"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--recipes", type=int, default=12, help="recipes per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock model latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--output-tokens-per-second", type=float, default=None)
+    parser.add_argument("--stream", action="store_true", help="stream structured answers")
+    parser.add_argument("--concurrent-post-processors", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc peak (slows the pipeline down)")
+    parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    benchmark_results = run_benchmark(
+        args.client_name, args.concurrency, args.recipes, args.latency, args.jitter, args.output_tokens_per_second,
+        args.stream, args.concurrent_post_processors, args.trace_memory, args.fixtures_dir,
+    )
+    print_report(benchmark_results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(benchmark_results, f, indent=2)
@@ -50,7 +50,7 @@ class DatabaseInterface(BaseDatabaseInterface):
             self.logger.log("Database connection established.")
             return conn, cur
         except Exception as e:
-            self.logger.error(f"Error connecting to database: {e}")
+            self.logger.error("Error connecting to database: %s", e)
             return None, None
 
     def execute_query(self, query, *args, **kwargs):
@@ -72,7 +72,7 @@ class DatabaseInterface(BaseDatabaseInterface):
         for table_name in schema_config['TABLES_CREATION_ORDER']:
             table_props = schema_config['RECIPE_DATABASE'][table_name]
             query = self.create_table_sql(table_name, table_props)
-            self.logger.info(f"Creating Table: {table_name}")
+            self.logger.info("Creating Table: %s", table_name)
             self.execute_query(query.replace('"', "'"))
 
         for _, table_constraints in schema_config['CONSTRAINTS'].items():
@@ -100,7 +100,7 @@ class DatabaseInterface(BaseDatabaseInterface):
         for category_name, category_values in self.db_config['CATEGORIES'].items():
             query = self.create_category_sql(category_name, category_values)
             self.execute_query(query.replace('"', "'"))
-            self.logger.info(f"Creating Category: {category_name}")
+            self.logger.info("Creating Category: %s", category_name)
         self.logger.log("Categories created successfully!")
 
     def drop_categories(self):
@@ -184,7 +184,7 @@ class DatabaseInterface(BaseDatabaseInterface):
         # Insert dish into main table
         text_recipe = remove_special_characters(text_recipe)
         default_dish_type = "Main Dish"  # for now
-        self.logger.info(f"Adding dish to kitchen setup: {dish_name}")
+        self.logger.info("Adding dish to kitchen setup: %s", dish_name)
         dish_id = self.insert_dish(description=text_recipe, name=dish_name, dish_type=default_dish_type)
 
         # Insert Ingredients
@@ -194,32 +194,54 @@ class DatabaseInterface(BaseDatabaseInterface):
             units = "units"
             if ingredient['name'] in self.setup_config['ALLOWED_INGREDIENTS'] and 'quantity' in self.setup_config['ALLOWED_INGREDIENTS'][ingredient['name']]:
                 units = self.setup_config['ALLOWED_INGREDIENTS'][ingredient['name']]['quantity']
-            self.logger.log(f"Adding ingredient to kitchen setup: {ingredient}")
+            self.logger.log("Adding ingredient to kitchen setup: %s", ingredient)
             ingredient_id = self.add_ingredient_to_inventory(
                 ingredient, category_id=default_category_id, units=units,
                 description=default_description
             )
             structured_recipe["ingredients"][idx]['ingredient_id'] = ingredient_id
-            self.logger.info(f"Adding ingredient to recipe: {ingredient}")
+            self.logger.info("Adding ingredient to recipe: %s", ingredient)
             self.add_ingredient_to_recipe(ingredient, dish_id, ingredient_id)
 
         # Insert Resources
         for idx, resource in enumerate(structured_recipe["resources"]):
             # TODO: FIX in pre-processing function
             resource_props = dict(resource_description="", volume=10, max_temperature=100)
-            self.logger.info(f"Adding resource to kitchen setup: {resource}")
+            self.logger.info("Adding resource to kitchen setup: %s", resource)
             resource_id = self.add_resource_to_kitchen_setup(resource, resource_props)
             structured_recipe["resources"][idx]["resource_id"] = resource_id
             # TODO: FIX in pre-processing function
             resource["occupancy"] = 1
             resource["temperature"] = np.nan if ("temperature" not in resource or resource["temperature"] is None) else resource["temperature"]
-            self.logger.info(f"Adding resource to recipe: {resource}")
+            self.logger.info("Adding resource to recipe: %s", resource)
             self.add_resource_to_recipe(resource, dish_id, resource_id)
 
         # Insert resource - ingredient mapping
         for edge in structured_recipe["edges"]:
-            self.logger.info(f"Adding resource-ingredient mapping: {edge}")
+            self.logger.info("Adding resource-ingredient mapping: %s", edge)
             self.add_resource_ingredient_mapping(dish_id, edge["from"], edge["to"], edge["instructions"])
 
-        self.logger.log(f"Successfully added dish {dish_name} to recipe")
+        self.logger.log("Successfully added dish %s to recipe", dish_name)
         return structured_recipe
+
+
+class DryRunDatabaseInterface(DatabaseInterface):
+    """
+    Builds the same queries as DatabaseInterface without a database connection, e.g. for benchmarks.
+    Queries are counted instead of executed, and RETURNING queries return increasing ids.
+    """
+    def __init__(self, *args, **kwargs):
+        self.executed_queries = 0
+        self._last_id = 0
+        super().__init__(*args, **kwargs)
+
+    def connect_to_db(self) -> Tuple:
+        self.logger.log("Dry run, no database connection.")
+        return None, None
+
+    def execute_query(self, query, *args, **kwargs):
+        self.executed_queries += 1
+        if "RETURNING" in query:
+            self._last_id += 1
+            return [(self._last_id,)]
+        return None
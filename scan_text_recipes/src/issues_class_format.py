@@ -1,10 +1,12 @@
 from dataclasses import dataclass
+from typing import List, Optional
 
 
 @dataclass
 class Issue:
     problem: str
     solution: str
+    node_ids: Optional[List] = None  # nodes involved in the issue, None - the whole graph
 
 
 @dataclass
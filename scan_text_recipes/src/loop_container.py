@@ -10,6 +10,7 @@ class LoopContainer:
     It initializes the pipeline segments based on the provided configuration and class type.
     The loop iterates through the segments for a specified number of iterations,
     processing the recipe in each iteration.
+    The recipe being processed is kept local to process_recipe, so a container may process several recipes concurrently.
     """
     def __init__(self, iterations: int, package_path: str, segment_config: List[Dict], class_type: Type, **kwargs):
         self.processors = initialize_pipeline_segments(
@@ -19,7 +20,6 @@ class LoopContainer:
             **kwargs
         )
         self._iterations = iterations
-        self.recipe = None
         self._logger = kwargs.get("logger")
 
     @abstractmethod
@@ -31,13 +31,13 @@ class LoopContainer:
         ...
 
     def process_recipe(self, **kwargs) -> [bool, Union[str, Dict]]:
-        self.recipe = self._copy_tmp_recipe(**kwargs)
+        recipe = self._copy_tmp_recipe(**kwargs)
         res = True
         for i in range(self._iterations):
             self._logger.info(f"Running iteration {i + 1} of {self._iterations}:")
-            res, self.recipe = self._run_loop(self.recipe, **kwargs)
+            res, recipe = self._run_loop(recipe, **kwargs)
             # if res:
             #     self._logger.log(f"Expected result achieved. Stopping the iterations")
             #     break
         self._logger.log(f"Finished processing the recipe after {self._iterations} iterations.")
-        return res, self.recipe
+        return res, recipe
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from scan_text_recipes.utils.paths import PROJECT_ROOT
+
+RECORD = "record"
+REPLAY = "replay"
+MODES = (RECORD, REPLAY)
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "model_interactions.jsonl")
+
+
+class CassetteMiss(Exception):
+    """
+    Raised in replay mode for a request the cassette holds no (more) responses for.
+    """
+
+
+class Cassette:
+    """
+    Record / replay of model interactions, so a pipeline run on real recipes can be repeated offline and deterministically.
+    Recording appends every request (by its cache key, with the messages for reference) and its response
+    to a JSON lines file. Replaying serves the recorded responses of each request in the recorded order,
+    so repeated identical requests get the same sequence of answers, regardless of the order of concurrent requests.
+    A recording starts from an empty file: an existing cassette at the path is overwritten.
+    One cassette is shared by all model interfaces using the same file, see for_path.
+    """
+    _cassettes: Dict[tuple, "Cassette"] = {}
+    _cassettes_lock = threading.Lock()
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, mode: str = REPLAY):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        self.path = path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+        self.mode = mode
+        self._responses: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            open(self.path, "w", encoding="utf-8").close()  # replay must not serve the responses of an older recording
+
+    @classmethod
+    def for_path(cls, path: str = DEFAULT_CASSETTE_PATH, mode: str = REPLAY) -> "Cassette":
+        with cls._cassettes_lock:
+            key = (path, mode)
+            if key not in cls._cassettes:
+                cls._cassettes[key] = cls(path, mode)
+            return cls._cassettes[key]
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> Optional["Cassette"]:
+        """
+        The cassette of a CASSETTE config block (MODE: record / replay, PATH), None if no MODE is set.
+        MODEL_CASSETTE_MODE and MODEL_CASSETTE_PATH environment variables override the config.
+        """
+        config = config or {}
+        mode = os.environ.get("MODEL_CASSETTE_MODE") or config.get("MODE")
+        if not mode or mode == "off":
+            return None
+        return cls.for_path(os.environ.get("MODEL_CASSETTE_PATH") or config.get("PATH") or DEFAULT_CASSETTE_PATH, mode)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No cassette to replay at {self.path}")
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self._responses[interaction["key"]].append(interaction["response"])
+
+    def record(self, key: str, messages: List[Dict], response: Dict):
+        line = json.dumps({"key": key, "messages": messages, "response": response}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def play(self, key: str) -> Dict:
+        """
+        The next recorded response of the request.
+        """
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise CassetteMiss(f"No recorded response left for request {key} in {self.path}")
+            return responses.popleft()
@@ -1,6 +1,9 @@
+import asyncio
 import os
+import threading
 from abc import abstractmethod
-from typing import Dict, List
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, List, Optional
 
 import openai
 import json
@@ -11,6 +14,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".
 from openai.types.chat import ChatCompletion
 from scan_text_recipes.utils.paths import PROJECT_ROOT
 from scan_text_recipes.src import LOGGER_PACKAGE_PATH
+from scan_text_recipes.src.model_interface.cassette import Cassette, CassetteMiss
+from scan_text_recipes.src.model_interface.request_governor import RequestGovernor, TokenBudgetExceeded, \
+    check_token_budget, charge_token_budget, response_tokens
+from scan_text_recipes.src.model_interface.response_cache import ResponseCache
+from scan_text_recipes.src.model_interface.token_counter import TokenCounter
+from scan_text_recipes.src.model_interface.streaming_json import CompletionStreamAccumulator, JsonStreamError, \
+    StreamingJsonParser, replay_items
 from scan_text_recipes.src.prompt_organizers.default_prompt_container import DefaultPromptsContainer
 from scan_text_recipes.tests.examples_for_tests import load_unstructured_text_test_recipe, load_test_setup_config
 from scan_text_recipes.utils.logger.basic_logger import BaseLogger
@@ -19,12 +29,63 @@ from scan_text_recipes.utils.utils import read_api_key, clean_json_output, write
 
 
 class ModelInterface:
-    def __init__(self, config: Dict = None, logger=None, **kwargs):
-        self.model_config: Dict = config if config else read_model_config()
+    # limit on in-flight model requests, shared by all model interfaces of the process (None - unlimited)
+    _request_slots: Optional[threading.BoundedSemaphore] = None
+
+    def __init__(
+            self, config: Dict = None, logger=None, partial_results_callback: Callable = None,
+            model_config_path: str = None, **kwargs
+    ):
+        self.model_config: Dict = config if config else read_model_config(model_config_path)
+        # called with (section name, items so far) while a structured answer is streamed, see STREAM
+        self.partial_results_callback = partial_results_callback
+        self.token_counter = TokenCounter.for_model(
+            self.model_config.get("MODEL_NAME"), self.model_config.get("TOKENIZER_ENCODING")
+        )
         self.logger = load_or_create_instance(
             logger, BaseLogger, LOGGER_PACKAGE_PATH, **{**{"name": self.__class__.__name__}, **kwargs}
         )
 
+    @staticmethod
+    def set_max_concurrent_requests(limit: Optional[int]):
+        ModelInterface._request_slots = threading.BoundedSemaphore(limit) if limit else None
+
+    @contextmanager
+    def request_slot(self):
+        """
+        Holds one of the shared request slots for the duration of a model request.
+        """
+        slots = ModelInterface._request_slots
+        if slots is None:
+            yield
+            return
+        slots.acquire()
+        try:
+            yield
+        finally:
+            slots.release()
+
+    @asynccontextmanager
+    async def arequest_slot(self):
+        """
+        Awaitable request_slot. The slots are shared with blocking requests of other threads, so they are acquired
+        in a worker thread; if the waiting task is cancelled, a slot acquired afterwards is released right away.
+        """
+        slots = ModelInterface._request_slots
+        if slots is None:
+            yield
+            return
+        acquire = asyncio.ensure_future(asyncio.to_thread(slots.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda task: slots.release() if not task.cancelled() and task.exception() is None else None)
+            raise
+        try:
+            yield
+        finally:
+            slots.release()
+
     @abstractmethod
     def get_structured_answer(self, messages: List[Dict]) -> Dict:
         ...
@@ -33,39 +94,186 @@ class ModelInterface:
     def get_text_answer(self, messages: List[Dict]) -> str:
         ...
 
+    async def aget_structured_answer(self, messages: List[Dict]) -> [bool, Dict]:
+        """
+        Awaitable get_structured_answer, runs the blocking call in a worker thread unless overridden.
+        """
+        return await asyncio.to_thread(self.get_structured_answer, messages)
+
+    async def aget_text_answer(self, messages: List[Dict]) -> [bool, str]:
+        return await asyncio.to_thread(self.get_text_answer, messages)
+
+    def discard_answer(self, messages: List[Dict]):
+        """
+        Called when the answer to messages turned out to be unusable (e.g. a patch that does not apply).
+        """
+
     @staticmethod
     def save_formatted_recipe(recipe_dict, filename):
         write_yaml(recipe_dict, os.path.join(PROJECT_ROOT, "..", "formatted_recipes", f"{filename}.yaml"))
 
-    @staticmethod
-    def get_number_of_tokens_from_the_text(text: str) -> int:
+    def get_number_of_tokens_from_the_text(self, text: str) -> int:
         """
-        Get the number of tokens from the text. NOTE: use count of words instead and multiply by 1.5
+        Get the number of tokens from the text, using the model's tokenizer (see TokenCounter).
         """
-        return int(len(text.split(" ")) * 1.5)
+        return self.token_counter.count(text)
+
+    def get_number_of_tokens_from_messages(self, messages: List[Dict]) -> int:
+        return self.token_counter.count_messages(messages)
 
 
 class RemoteAPIModelInterface(ModelInterface):
     def __init__(self, config: Dict = None, **kwargs):
-        super().__init__(config if config else read_model_config(), **kwargs)
-        self.client = openai.OpenAI(
-            api_key=read_api_key(self.model_config['API_KEY_NAME']),
-            base_url=self.model_config['BASE_URL']
-        )
+        super().__init__(config, **kwargs)
+        self._client = None
+        self.response_cache = ResponseCache.from_config(self.model_config.get("RESPONSE_CACHE"))
+        # record model interactions to a cassette, or replay them offline (see CASSETTE)
+        self.cassette = Cassette.from_config(self.model_config.get("CASSETTE"))
+        self.governor = RequestGovernor.for_model(self.model_config)
+        # stream structured answers, validating the JSON as it arrives and retrying malformed answers early
+        self.stream = self.model_config.get("STREAM", False)
+        self.stream_retries = self.model_config.get("STREAM_RETRIES", 2)
+        self.stream_sections = self.model_config.get("STREAM_SECTIONS", ["ingredients"])
 
-    def get_response(self, messages: List[Dict]) -> ChatCompletion:
-        self.logger.info("Sending request to the model...")
-        return self.client.chat.completions.create(
-            model=self.model_config["MODEL_NAME"],
-            messages=messages,
+    @property
+    def client(self) -> openai.OpenAI:
+        # created on first use, so replaying a cassette needs no API key
+        if self._client is None:
+            self._client = openai.OpenAI(
+                api_key=self.api_key,
+                base_url=self.model_config['BASE_URL']
+            )
+        return self._client
+
+    @property
+    def api_key(self) -> str:
+        # API_KEY in the model config is meant for local servers only (e.g. benchmarks/mock_model_server.py)
+        return self.model_config.get('API_KEY') or read_api_key(self.model_config['API_KEY_NAME'])
+
+    def request_params(self) -> Dict:
+        return dict(
             top_p=self.model_config['TOP_P'],
             temperature=self.model_config['TEMPERATURE'],
             logprobs=self.model_config['LOGPROBS'],
             top_logprobs=self.model_config['TOP_LOGPROBS']
         )
 
+    def cache_key(self, messages: List[Dict]) -> str:
+        return ResponseCache.make_key(
+            self.model_config["MODEL_NAME"], messages, self.request_params(), self.model_config["BASE_URL"]
+        )
+
+    def get_cached_response(self, messages: List[Dict], json_stream: bool = False) -> Optional[ChatCompletion]:
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get(self.cache_key(messages))
+        if cached is None:
+            return None
+        self.logger.info("Using cached model response")
+        response = ChatCompletion.model_validate(cached)
+        if json_stream:
+            replay_items(response.choices[0].message.content, self.stream_sections, self.partial_results_callback)
+        return response
+
+    def cache_response(self, messages: List[Dict], response: ChatCompletion):
+        charge_token_budget(response_tokens(response))
+        if self.response_cache is not None:
+            self.response_cache.put(self.cache_key(messages), response.model_dump(mode="json"))
+
+    def stream_parser(self) -> StreamingJsonParser:
+        return StreamingJsonParser(self.stream_sections, self.partial_results_callback)
+
+    def charge_aborted_stream(self, messages: List[Dict], accumulator: CompletionStreamAccumulator):
+        charge_token_budget(
+            self.get_number_of_tokens_from_messages(messages) + self.get_number_of_tokens_from_the_text(accumulator.text)
+        )
+
+    def create_completion(self, messages: List[Dict]) -> ChatCompletion:
+        return self.client.chat.completions.create(
+            model=self.model_config["MODEL_NAME"],
+            messages=messages,
+            **self.request_params()
+        )
+
+    def create_streamed_completion(self, messages: List[Dict]) -> ChatCompletion:
+        """
+        Streams a JSON answer, closing the stream (which stops the generation) at the first character
+        that cannot be part of valid JSON.
+        """
+        parser, accumulator = self.stream_parser(), CompletionStreamAccumulator()
+        with self.client.chat.completions.create(
+                model=self.model_config["MODEL_NAME"],
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.request_params()
+        ) as stream:
+            try:
+                for chunk in stream:
+                    parser.feed(accumulator.add(chunk))
+                parser.close()
+            except JsonStreamError:
+                self.charge_aborted_stream(messages, accumulator)
+                raise
+        return ChatCompletion.model_validate(accumulator.to_completion())
+
+    def replay_response(self, messages: List[Dict], json_stream: bool = False) -> ChatCompletion:
+        """
+        The next response to messages recorded in the cassette, raises CassetteMiss if there is none.
+        """
+        response = ChatCompletion.model_validate(self.cassette.play(self.cache_key(messages)))
+        charge_token_budget(response_tokens(response))
+        if json_stream:
+            replay_items(response.choices[0].message.content, self.stream_sections, self.partial_results_callback)
+        return response
+
+    def record_response(self, messages: List[Dict], response: ChatCompletion):
+        if self.cassette is not None and self.cassette.recording:
+            self.cassette.record(self.cache_key(messages), messages, response.model_dump(mode="json"))
+
+    def get_response(self, messages: List[Dict], json_stream: bool = False) -> ChatCompletion:
+        """
+        The model response to messages: replayed from the cassette, or from the response cache or the model
+        (recorded to the cassette in record mode).
+        """
+        if self.cassette is not None and self.cassette.replaying:
+            return self.replay_response(messages, json_stream)
+        response = self.request_response(messages, json_stream)
+        self.record_response(messages, response)
+        return response
+
+    def request_response(self, messages: List[Dict], json_stream: bool = False) -> ChatCompletion:
+        response = self.get_cached_response(messages, json_stream)
+        if response is not None:
+            return response
+        request = self.create_streamed_completion if json_stream else self.create_completion
+        for attempt in range(self.stream_retries + 1 if json_stream else 1):
+            check_token_budget()
+            self.logger.info("Sending request to the model...")
+            try:
+                with self.request_slot():
+                    response = self.governor.call(
+                        lambda: request(messages),
+                        estimated_tokens=self.get_number_of_tokens_from_messages(messages),
+                        logger=self.logger,
+                    )
+                break
+            except JsonStreamError as e:
+                if attempt == self.stream_retries:
+                    raise
+                self.logger.warning("Aborted malformed answer (%s), retrying", e)
+        self.cache_response(messages, response)
+        return response
+
     def get_structured_answer(self, messages: List[Dict]) -> [bool, Dict]:
-        response = self.get_response(messages)
+        try:
+            response = self.get_response(messages, json_stream=self.stream)
+        except (openai.OpenAIError, JsonStreamError, CassetteMiss) as e:
+            self.logger.error(f"Model request failed: {e}")
+            return False, {}
+        return self.parse_structured_answer(response, messages)
+
+    def parse_structured_answer(self, response: ChatCompletion, messages: List[Dict]) -> [bool, Dict]:
         # Extract response
         try:
             formatted_recipe = clean_json_output(response.choices[0].message.content)
@@ -74,20 +282,125 @@ class RemoteAPIModelInterface(ModelInterface):
             return True, response
         except json.JSONDecodeError:
             self.logger.error(f"Invalid JSON response: {json.JSONDecodeError}")
+            self.discard_answer(messages)
             return False, {}
 
+    def discard_answer(self, messages: List[Dict]):
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self.cache_key(messages))  # do not replay an unusable answer
+
     def get_text_answer(self, messages: List[Dict]) -> [bool, str]:
         try:
             response = self.get_response(messages)
             content = response.choices[0].message.content
             self.logger.info("Received valid reply")
             return True, content
+        except TokenBudgetExceeded:
+            raise
         except Exception as e:
             self.logger.error(f"Error occurred in response: {e}")
             print()
             return False, ""
 
 
+class AsyncRemoteAPIModelInterface(RemoteAPIModelInterface):
+    """
+    Remote API model interface with native asyncio calls (openai.AsyncOpenAI), so that concurrent pipeline stages
+    wait for the model without blocking each other. The blocking methods are still available.
+    The async client is bound to the event loop it was created in, so one is created per running loop.
+    """
+    def __init__(self, config: Dict = None, **kwargs):
+        super().__init__(config, **kwargs)
+        self._async_client = None
+        self._async_client_loop = None
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.model_config['BASE_URL']
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    async def acreate_completion(self, messages: List[Dict]) -> ChatCompletion:
+        return await self.async_client.chat.completions.create(
+            model=self.model_config["MODEL_NAME"],
+            messages=messages,
+            **self.request_params()
+        )
+
+    async def acreate_streamed_completion(self, messages: List[Dict]) -> ChatCompletion:
+        parser, accumulator = self.stream_parser(), CompletionStreamAccumulator()
+        async with await self.async_client.chat.completions.create(
+                model=self.model_config["MODEL_NAME"],
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.request_params()
+        ) as stream:
+            try:
+                async for chunk in stream:
+                    parser.feed(accumulator.add(chunk))
+                parser.close()
+            except JsonStreamError:
+                self.charge_aborted_stream(messages, accumulator)
+                raise
+        return ChatCompletion.model_validate(accumulator.to_completion())
+
+    async def aget_response(self, messages: List[Dict], json_stream: bool = False) -> ChatCompletion:
+        if self.cassette is not None and self.cassette.replaying:
+            return self.replay_response(messages, json_stream)
+        response = await self.arequest_response(messages, json_stream)
+        self.record_response(messages, response)
+        return response
+
+    async def arequest_response(self, messages: List[Dict], json_stream: bool = False) -> ChatCompletion:
+        response = self.get_cached_response(messages, json_stream)
+        if response is not None:
+            return response
+        request = self.acreate_streamed_completion if json_stream else self.acreate_completion
+        for attempt in range(self.stream_retries + 1 if json_stream else 1):
+            check_token_budget()
+            self.logger.info("Sending request to the model...")
+            try:
+                async with self.arequest_slot():
+                    response = await self.governor.acall(
+                        lambda: request(messages),
+                        estimated_tokens=self.get_number_of_tokens_from_messages(messages),
+                        logger=self.logger,
+                    )
+                break
+            except JsonStreamError as e:
+                if attempt == self.stream_retries:
+                    raise
+                self.logger.warning("Aborted malformed answer (%s), retrying", e)
+        self.cache_response(messages, response)
+        return response
+
+    async def aget_structured_answer(self, messages: List[Dict]) -> [bool, Dict]:
+        try:
+            response = await self.aget_response(messages, json_stream=self.stream)
+        except (openai.OpenAIError, JsonStreamError, CassetteMiss) as e:
+            self.logger.error(f"Model request failed: {e}")
+            return False, {}
+        return self.parse_structured_answer(response, messages)
+
+    async def aget_text_answer(self, messages: List[Dict]) -> [bool, str]:
+        try:
+            response = await self.aget_response(messages)
+            content = response.choices[0].message.content
+            self.logger.info("Received valid reply")
+            return True, content
+        except TokenBudgetExceeded:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error occurred in response: {e}")
+            return False, ""
+
+
 if __name__ == '__main__':
     model_config = read_model_config()
     # Test the model interface
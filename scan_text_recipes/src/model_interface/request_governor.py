@@ -0,0 +1,224 @@
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+
+import openai
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class TokenBudgetExceeded(Exception):
+    """
+    Raised when a recipe spent its token budget, aborting the recipe.
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute, holding at most one minute of tokens.
+    Reservations may overdraw the bucket: the caller waits the returned time, so waiting is left to the caller
+    (time.sleep or asyncio.sleep) and reservations are served in order.
+    """
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes amount tokens (at most the capacity) and returns the time to wait before using them.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate_per_second
+
+    def debit(self, amount: float):
+        """
+        Takes tokens without waiting, e.g. to correct an estimate after the actual usage is known.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class RequestGovernor:
+    """
+    Rate limiting (requests and tokens per minute) and retries with exponential backoff and jitter for model requests.
+    One governor is shared by all model interfaces of the same model, see for_model.
+    """
+    _governors: Dict[str, "RequestGovernor"] = {}
+    _governors_lock = threading.Lock()
+
+    def __init__(
+            self, requests_per_minute: float = None, tokens_per_minute: float = None,
+            max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0
+    ):
+        self.requests_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def for_model(cls, model_config: Dict) -> "RequestGovernor":
+        """
+        The governor of the configured model (RATE_LIMIT and RETRY blocks of the model config).
+        """
+        rate_limit = model_config.get("RATE_LIMIT") or {}
+        retry = model_config.get("RETRY") or {}
+        with cls._governors_lock:
+            key = model_config.get("MODEL_NAME") or model_config.get("BASE_URL") or ""
+            if key not in cls._governors:
+                cls._governors[key] = cls(
+                    requests_per_minute=rate_limit.get("REQUESTS_PER_MINUTE"),
+                    tokens_per_minute=rate_limit.get("TOKENS_PER_MINUTE"),
+                    max_retries=retry.get("MAX_RETRIES", 5),
+                    base_delay=retry.get("BASE_DELAY_SECONDS", 1.0),
+                    max_delay=retry.get("MAX_DELAY_SECONDS", 60.0),
+                )
+            return cls._governors[key]
+
+    def reserve(self, estimated_tokens: int) -> float:
+        wait_time = self.requests_bucket.reserve(1) if self.requests_bucket is not None else 0.0
+        if self.tokens_bucket is not None:
+            wait_time = max(wait_time, self.tokens_bucket.reserve(estimated_tokens))
+        return wait_time
+
+    def record_usage(self, estimated_tokens: int, used_tokens: Optional[int]):
+        if self.tokens_bucket is not None and used_tokens is not None and used_tokens > estimated_tokens:
+            self.tokens_bucket.debit(used_tokens - estimated_tokens)
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True  # APITimeoutError is an APIConnectionError
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+        return False
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Full jitter exponential backoff, at least the Retry-After the server asked for.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    def call(self, request: Callable[[], object], estimated_tokens: int = 0, logger=None):
+        """
+        Calls request() within the rate limits, retrying retryable errors up to max_retries times.
+        """
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.reserve(estimated_tokens))
+            try:
+                response = request()
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                if logger is not None:
+                    logger.warning("Model request failed (%s), retrying in %.1f seconds", e, delay)
+                time.sleep(delay)
+                continue
+            self.record_usage(estimated_tokens, response_tokens(response))
+            return response
+
+    async def acall(self, request: Callable[[], Awaitable], estimated_tokens: int = 0, logger=None):
+        """
+        Awaitable call, request() returns a coroutine.
+        """
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve(estimated_tokens))
+            try:
+                response = await request()
+            except Exception as e:
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                if logger is not None:
+                    logger.warning("Model request failed (%s), retrying in %.1f seconds", e, delay)
+                await asyncio.sleep(delay)
+                continue
+            self.record_usage(estimated_tokens, response_tokens(response))
+            return response
+
+
+def response_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+_current_budget: ContextVar[Optional["TokenBudget"]] = ContextVar("token_budget", default=None)
+_current_stage: ContextVar[str] = ContextVar("token_stage", default="other")
+
+
+class TokenBudget:
+    """
+    Token budget of a single recipe, a context manager: model requests made within the context
+    (including worker threads and tasks started from it, which copy the context) are charged to it,
+    and once it is spent further requests raise TokenBudgetExceeded.
+    Tokens are also summed per pipeline stage (see token_stage) in stage_tokens.
+    """
+    def __init__(self, max_tokens: Optional[int]):
+        self.max_tokens = max_tokens
+        self.used_tokens = 0
+        self.stage_tokens = defaultdict(int)
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self) -> "TokenBudget":
+        self._token = _current_budget.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_budget.reset(self._token)
+
+    def check(self):
+        if self.max_tokens and self.used_tokens >= self.max_tokens:
+            raise TokenBudgetExceeded(f"Token budget exceeded: {self.used_tokens} of {self.max_tokens} tokens used")
+
+    def charge(self, tokens: Optional[int]):
+        with self._lock:
+            self.used_tokens += tokens or 0
+            self.stage_tokens[_current_stage.get()] += tokens or 0
+
+
+@contextmanager
+def token_stage(stage_name: str):
+    """
+    Charges the tokens of the model requests made within the context to stage_name.
+    """
+    token = _current_stage.set(stage_name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def check_token_budget():
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.check()
+
+
+def charge_token_budget(tokens: Optional[int]):
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.charge(tokens)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from scan_text_recipes.utils.paths import PROJECT_ROOT
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "llm_responses.sqlite")
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache of model responses, content-addressed by a hash of the model name,
+    the messages and all request parameters. Entries expire after ttl_seconds, and the least recently used
+    entries are evicted once there are more than max_entries or they take more than max_size_mb.
+    """
+    def __init__(
+            self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = 7 * 24 * 3600,
+            max_entries: int = 10000, max_size_mb: float = 200
+    ):
+        self.path = path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT, size INTEGER, created_at REAL, last_access REAL)"
+            )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> Optional["ResponseCache"]:
+        """
+        Builds the cache from a RESPONSE_CACHE config block, None if the block is missing or not ENABLED.
+        """
+        if not config or not config.get("ENABLED", False):
+            return None
+        return cls(
+            path=config.get("PATH", DEFAULT_CACHE_PATH),
+            ttl_seconds=config.get("TTL_SECONDS", 7 * 24 * 3600),
+            max_entries=config.get("MAX_ENTRIES", 10000),
+            max_size_mb=config.get("MAX_SIZE_MB", 200),
+        )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:  # commits on success
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model_name: str, messages: List[Dict], params: Dict, base_url: Optional[str] = None) -> str:
+        payload = json.dumps(
+            {"base_url": base_url, "model": model_name, "messages": messages, "params": params}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(response)
+
+    def put(self, key: str, response: Dict):
+        encoded = json.dumps(response, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def invalidate(self, key: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count, total_size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total_size <= self.max_size_bytes:
+            return
+        # drop least recently used entries until both limits hold
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if count <= self.max_entries and total_size <= self.max_size_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total_size -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
@@ -0,0 +1,241 @@
+import json
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+LITERALS = ("true", "false", "null")
+NUMBER_PREFIX = re.compile(r"-?(0|[1-9]\d*)?(\.\d*)?([eE][+-]?\d*)?")
+NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+PREAMBLE = re.compile(r"\s*(`{1,3}\s*)?[A-Za-z]*\s*")  # e.g. ```json before the JSON itself
+MAX_PREAMBLE_LENGTH = 32
+WHITESPACE = " \t\r\n"
+HEX_DIGITS = "0123456789abcdefABCDEF"
+CLOSING = {"{": "}", "[": "]"}
+
+
+class JsonStreamError(ValueError):
+    """
+    Raised as soon as the streamed text can no longer be the prefix of a valid JSON answer.
+    """
+
+
+class StreamingJsonParser:
+    """
+    Incremental JSON validator for streamed model answers.
+    feed() checks every character against the JSON grammar and raises JsonStreamError at the first character that
+    cannot continue a valid JSON document, so a malformed answer is detected without waiting for the whole completion.
+    A markdown code fence (```json ... ```) around the JSON is tolerated, like clean_json_output.
+    Objects completed inside arrays of watch_keys (e.g. "ingredients") are decoded as soon as they close
+    and passed to on_item(key, items so far).
+    """
+    def __init__(self, watch_keys: Iterable[str] = ("ingredients",), on_item: Callable[[str, List[Dict]], None] = None):
+        self.watch_keys = set(watch_keys)
+        self.on_item = on_item
+        self.items: Dict[str, List[Dict]] = {key: [] for key in self.watch_keys}
+        self.text = ""
+        self.position = 0
+        self.stack = []  # frames: [container type, start position, last key]
+        self.expect = "preamble"
+        self.preamble = ""
+        self.string_start = None
+        self.string_is_key = False
+        self.escape = False
+        self.unicode_digits = 0
+        self.token = ""
+        self.token_kind = None
+
+    def fail(self, char: str, reason: str):
+        raise JsonStreamError(f"Unexpected {char!r} at {self.position}: {reason}")
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        for char in chunk:
+            self._feed_char(char)
+            self.position += 1
+
+    def _feed_char(self, char: str):
+        if self.string_start is not None:
+            return self._string_char(char)
+        if self.token_kind is not None and self._token_char(char):
+            return
+        if self.expect == "preamble":
+            if char in "{[":
+                self.expect = "value"
+            else:
+                self.preamble += char
+                if len(self.preamble) > MAX_PREAMBLE_LENGTH or not PREAMBLE.fullmatch(self.preamble):
+                    self.fail(char, "text before the JSON answer")
+                return
+        if char in WHITESPACE:
+            return
+        if self.expect == "done":
+            if char != "`":
+                self.fail(char, "text after the JSON answer")
+            return
+        if self.expect == "colon":
+            if char != ":":
+                self.fail(char, "expected ':'")
+            self.expect = "value"
+        elif self.expect in ("key", "key_or_end"):
+            if char == "}" and self.expect == "key_or_end":
+                self._close(char)
+            elif char == '"':
+                self._open_string(is_key=True)
+            else:
+                self.fail(char, "expected an object key")
+        elif self.expect == "comma_or_end":
+            if char == ",":
+                self.expect = "key" if self.stack[-1][0] == "{" else "value"
+            elif char == CLOSING[self.stack[-1][0]]:
+                self._close(char)
+            else:
+                self.fail(char, "expected ',' or the end of the container")
+        elif self.expect in ("value", "value_or_end"):
+            if char == "]" and self.expect == "value_or_end":
+                self._close(char)
+            else:
+                self._open_value(char)
+
+    def _open_value(self, char: str):
+        if char in "{[":
+            self.stack.append([char, self.position, None])
+            self.expect = "key_or_end" if char == "{" else "value_or_end"
+        elif char == '"':
+            self._open_string(is_key=False)
+        elif char == "-" or char.isdigit():
+            self.token_kind, self.token = "number", char
+        elif char in "tfn":
+            self.token_kind, self.token = "literal", char
+        else:
+            self.fail(char, "expected a value")
+
+    def _open_string(self, is_key: bool):
+        self.string_start = self.position
+        self.string_is_key = is_key
+
+    def _string_char(self, char: str):
+        if self.unicode_digits:
+            if char not in HEX_DIGITS:
+                self.fail(char, "invalid unicode escape")
+            self.unicode_digits -= 1
+        elif self.escape:
+            if char not in '"\\/bfnrtu':
+                self.fail(char, "invalid escape")
+            self.escape = False
+            self.unicode_digits = 4 if char == "u" else 0
+        elif char == "\\":
+            self.escape = True
+        elif char == '"':
+            if self.string_is_key:
+                self.stack[-1][2] = json.loads(self.text[self.string_start:self.position + 1])
+                self.expect = "colon"
+            else:
+                self._value_done()
+            self.string_start = None
+        elif ord(char) < 0x20:
+            self.fail(char, "control character in string")
+
+    def _token_char(self, char: str) -> bool:
+        """
+        Continues a number or literal token, returns False (after completing the token) if char is not part of it.
+        """
+        if self.token_kind == "number":
+            if char in "0123456789+-.eE":
+                self.token += char
+                if not NUMBER_PREFIX.fullmatch(self.token):
+                    self.fail(char, "invalid number")
+                return True
+            if not NUMBER.fullmatch(self.token):
+                self.fail(char, "invalid number")
+        else:
+            if char.isalpha():
+                self.token += char
+                if not any(literal.startswith(self.token) for literal in LITERALS):
+                    self.fail(char, "invalid literal")
+                return True
+            if self.token not in LITERALS:
+                self.fail(char, "invalid literal")
+        self.token_kind, self.token = None, ""
+        self._value_done()
+        return False
+
+    def _close(self, char: str):
+        container, start, _ = self.stack.pop()
+        if container == "{" and len(self.stack) >= 2 and self.stack[-1][0] == "[" and self.stack[-2][0] == "{":
+            key = self.stack[-2][2]
+            if key in self.watch_keys:
+                self.items[key].append(json.loads(self.text[start:self.position + 1]))
+                if self.on_item is not None:
+                    self.on_item(key, list(self.items[key]))
+        self._value_done()
+
+    def _value_done(self):
+        self.expect = "comma_or_end" if self.stack else "done"
+
+    def close(self):
+        """
+        Called at the end of the stream, raises JsonStreamError if the JSON is incomplete.
+        """
+        if self.expect != "done":
+            raise JsonStreamError(f"Incomplete JSON answer ({len(self.text)} characters)")
+
+
+class CompletionStreamAccumulator:
+    """
+    Collects the chunks of a streamed chat completion into a ChatCompletion-shaped dict,
+    so streamed answers are cached and handled like regular ones.
+    """
+    def __init__(self):
+        self.id = None
+        self.model = None
+        self.created = None
+        self.content = []
+        self.finish_reason = None
+        self.usage = None
+
+    def add(self, chunk) -> str:
+        """
+        Adds a ChatCompletionChunk, returns its content delta.
+        """
+        self.id = self.id or chunk.id
+        self.model = self.model or chunk.model
+        self.created = self.created or chunk.created
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage.model_dump()
+        if not chunk.choices:
+            return ""
+        choice = chunk.choices[0]
+        self.finish_reason = choice.finish_reason or self.finish_reason
+        delta = choice.delta.content or ""
+        self.content.append(delta)
+        return delta
+
+    @property
+    def text(self) -> str:
+        return "".join(self.content)
+
+    def to_completion(self) -> Dict:
+        return {
+            "id": self.id or "stream",
+            "object": "chat.completion",
+            "created": self.created or int(time.time()),
+            "model": self.model or "",
+            "choices": [{
+                "index": 0,
+                "finish_reason": self.finish_reason or "stop",
+                "message": {"role": "assistant", "content": self.text},
+            }],
+            "usage": self.usage,
+        }
+
+
+def replay_items(text: str, watch_keys: Iterable[str], on_item: Optional[Callable[[str, List[Dict]], None]]):
+    """
+    Reports the watched items of a complete (e.g. cached) answer, as if it was streamed. Errors are ignored.
+    """
+    if on_item is None:
+        return
+    try:
+        StreamingJsonParser(watch_keys, on_item).feed(text)
+    except JsonStreamError:
+        pass
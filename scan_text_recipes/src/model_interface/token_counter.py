@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List
+
+import tiktoken
+
+DEFAULT_ENCODING = "o200k_base"
+# chat format overhead (OpenAI cookbook): tokens per message and for priming the assistant reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = None, encoding_name: str = None) -> tiktoken.Encoding:
+    """
+    The tiktoken encoding of a model, or encoding_name (default o200k_base) for models tiktoken does not know,
+    e.g. DeepSeek, where it is a close approximation of the model's own BPE tokenizer.
+    tiktoken downloads the BPE file of an encoding on first use and caches it in TIKTOKEN_CACHE_DIR
+    (default: a temporary directory); point it to a pre-seeded directory to run offline (see Dockerfile.recipe).
+    """
+    if encoding_name is None and model_name:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            pass
+    return tiktoken.get_encoding(encoding_name or DEFAULT_ENCODING)
+
+
+class TokenCounter:
+    """
+    Counts tokens with a real BPE tokenizer. Counts are cached by text hash, since the same recipe text and prompt
+    parts are counted again by every stage (simplifier decision, rate limiting, budgets).
+    The encoding is loaded on the first count, so creating a counter (e.g. a model interface replaying a cassette)
+    needs no network access.
+    """
+    _counters: Dict[tuple, "TokenCounter"] = {}
+    _counters_lock = threading.Lock()
+
+    def __init__(self, model_name: str = None, encoding_name: str = None, max_cached_counts: int = 4096):
+        self.model_name = model_name
+        self.encoding_name = encoding_name
+        self.max_cached_counts = max_cached_counts
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, model_name: str = None, encoding_name: str = None) -> "TokenCounter":
+        with cls._counters_lock:
+            key = (model_name, encoding_name)
+            if key not in cls._counters:
+                cls._counters[key] = cls(model_name, encoding_name)
+            return cls._counters[key]
+
+    @property
+    def encoding(self) -> tiktoken.Encoding:
+        return get_encoding(self.model_name, self.encoding_name)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        count = len(self.encoding.encode(text, disallowed_special=()))
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.max_cached_counts:
+                self._counts.popitem(last=False)
+        return count
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        return TOKENS_PER_REPLY + sum(
+            TOKENS_PER_MESSAGE + self.count(str(message.get("role") or "")) + self.count(str(message.get("content") or ""))
+            for message in messages
+        )
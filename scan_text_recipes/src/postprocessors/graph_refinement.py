@@ -3,6 +3,9 @@ from typing import Union
 from scan_text_recipes.src import MODEL_INTERFACE_PACKAGE_PATH
 from scan_text_recipes.src.model_interface.remote_model_interface import ModelInterface
 from scan_text_recipes.src.postprocessors.post_processors import PostProcessor
+from scan_text_recipes.src.prompt_organizers.compact_encoding import encode_compact, expand_keys, merge_subgraph, \
+    next_free_id, relevant_subgraph
+from scan_text_recipes.src.postprocessors.recipe_patch import RecipePatchError, apply_patch, patch_instructions
 from scan_text_recipes.src.prompt_organizers.graph_structure_refinement_prompts import Issue, GraphEdgesPromptsContainer
 from scan_text_recipes.utils.utils import load_or_create_instance, read_yaml
 
@@ -33,8 +36,15 @@ def check_node(
 
 
 class GraphRefinement(PostProcessor):
-    def __init__(self, setup_config: Union[str, Dict], model_interface: Union[None, ModelInterface], **kwargs):
+    def __init__(
+            self, setup_config: Union[str, Dict], model_interface: Union[None, ModelInterface],
+            compact_prompts: bool = True, patch_responses: bool = True, **kwargs
+    ):
         super().__init__(**kwargs)
+        # send only the subgraph relevant to the issues, as compact JSON (see compact_encoding)
+        self.compact_prompts = compact_prompts
+        # the model answers with patch operations on the graph instead of the whole updated graph (see recipe_patch)
+        self.patch_responses = patch_responses
         self.prompts = GraphEdgesPromptsContainer(setup_config, **kwargs)
         self.model_interface = load_or_create_instance(
             model_interface, ModelInterface, MODEL_INTERFACE_PACKAGE_PATH, **kwargs
@@ -57,11 +67,15 @@ class GraphRefinement(PostProcessor):
                 "Cant find final node.",
                 f"Fix the graph so all ingredient nodes eventually lead to a final node named {self.final_node_name} - while keeping The graph Acyclic!"
             )
+        failed_ids = []
         for ingredient in recipe_dict["ingredients"]:
-            check_node_result = check_node_result & check_node(ingredient["id"], recipe_dict, final_node_id)
+            if not check_node(ingredient["id"], recipe_dict, final_node_id):
+                check_node_result = False
+                failed_ids.append(ingredient["id"])
         return Issue(
             "Not all ingredients eventually lead to a final dish node.",
-            "Fix the graph so all ingredients lead to a final dish node, while keeping The graph Acyclic!"
+            "Fix the graph so all ingredients lead to a final dish node, while keeping The graph Acyclic!",
+            node_ids=failed_ids + [final_node_id]
         ) if not check_node_result else None
 
     def check_all_resources_in_final_dish(self, recipe_dict: Dict[str, List], recipe_text: str) -> [bool, Dict[str, List]]:
@@ -78,11 +92,15 @@ class GraphRefinement(PostProcessor):
                 "Cant find final node.",
                 f"Fix the graph so all resource nodes lead eventually to a final node named {self.final_node_name} - while keeping The graph Acyclic!"
             )
+        failed_ids = []
         for resource in recipe_dict["resources"]:
-            check_node_result = (check_node_result & check_node(resource["id"], recipe_dict, final_node_id))
+            if not check_node(resource["id"], recipe_dict, final_node_id):
+                check_node_result = False
+                failed_ids.append(resource["id"])
         return Issue(
             "All ingredients used in any of the resources do not lead to a final dish node.",
-            "Fix the graph so all that used in all of the resources lead to a final dish node, while keeping The graph Acyclic!"
+            "Fix the graph so all that used in all of the resources lead to a final dish node, while keeping The graph Acyclic!",
+            node_ids=failed_ids + [final_node_id]
         ) if not check_node_result else None
 
     def check_if_final_node_present(self, recipe_dict: Dict[str, List], recipe_text: str) -> [bool, Dict[str, List]]:
@@ -106,32 +124,39 @@ class GraphRefinement(PostProcessor):
             i.e. we expect to put something and take something out of every resource.
         """
         all_edges_valid = True
+        failed_ids = []
         for resource in recipe_dict["resources"]:
             going_in = resource['id'] in [node["to"] for node in recipe_dict["edges"]]
             going_out = resource['id'] in [node["from"] for node in recipe_dict["edges"]]
             if not( going_in and going_out):
                 all_edges_valid = False
+                failed_ids.append(resource['id'])
         if all_edges_valid:
             return None
         else:
             return Issue(
                 "The graph does not use all resources in the recipe.",
                 f"""Fix the graph so all resources are used in the recipe.
-                For each resource node there should be at least on incoming and one outgoing edge to ingredient nodes."""
+                For each resource node there should be at least on incoming and one outgoing edge to ingredient nodes.""",
+                node_ids=failed_ids
             )
 
     @staticmethod
     def check_all_ingredients_connectivity(recipe_dict: Dict[str, List], recipe_text: str) -> [bool, Dict[str, List]]:
         all_edges_valid = True
+        failed_ids = []
         for ingredient in recipe_dict["ingredients"]:
             used = any([ingredient["id"] == edge["to"] or ingredient['id'] == edge['from'] for edge in recipe_dict["edges"]])
             all_edges_valid = all_edges_valid & used
+            if not used:
+                failed_ids.append(ingredient["id"])
         if all_edges_valid:
             return None
         else:
             return Issue(
                 "The graph does not use all ingredients in the recipe.",
-                "Fix the graph so all ingredients are used in the recipe."
+                "Fix the graph so all ingredients are used in the recipe.",
+                node_ids=failed_ids
             )
 
     @staticmethod
@@ -174,21 +199,77 @@ class GraphRefinement(PostProcessor):
             self.logger.warning(f"Asking for solution: {issue.solution}")
         return issues
 
+    @staticmethod
+    def issues_node_ids(issues: List[Issue]) -> Union[None, Set]:
+        """
+        Ids of the nodes involved in the issues, None if any issue concerns the whole graph.
+        """
+        if any(issue.node_ids is None for issue in issues):
+            return None
+        return {node_id for issue in issues for node_id in issue.node_ids if node_id is not None}
+
+    def create_messages(
+            self, issues: List[Issue], recipe_dict: Dict[str, List], recipe_text: str, patch: bool
+    ) -> [List[Dict], Union[None, Set], Dict[str, List]]:
+        """
+        Messages asking to fix the issues (with patch operations if patch), the ids of the nodes involved
+        (None - the whole graph) and the (sub)graph sent.
+        """
+        response_format = patch_instructions() if patch else None
+        node_ids, subgraph = None, recipe_dict
+        if not self.compact_prompts:
+            user_prompt = self.prompts.user_recipe_prompt(
+                list_of_issues=issues,
+                recipe_text=recipe_text,
+                recipe_dict=recipe_dict,
+                response_format=response_format,
+            )
+        else:
+            node_ids = self.issues_node_ids(issues)
+            subgraph = relevant_subgraph(recipe_dict, node_ids)
+            encoded_graph, keys_legend = encode_compact(subgraph)
+            user_prompt = self.prompts.user_recipe_prompt(
+                list_of_issues=issues,
+                recipe_text=recipe_text,
+                recipe_dict=encoded_graph,
+                legend=keys_legend,
+                partial=node_ids is not None,
+                next_id=next_free_id(recipe_dict),
+                response_format=response_format,
+            )
+        messages = [
+            {"role": "system", "content": self.prompts.system_prompt()},
+            {"role": "user", "content": user_prompt},
+            {"role": "assistant", "content": self.prompts.assistant_prompt()}
+        ]
+        return messages, node_ids, subgraph
+
+    def refine_graph(
+            self, issues: List[Issue], recipe_dict: Dict[str, List], recipe_text: str, patch: bool
+    ) -> [bool, Dict[str, List]]:
+        messages, node_ids, subgraph = self.create_messages(issues, recipe_dict, recipe_text, patch)
+        res, refined_recipe = self.model_interface.get_structured_answer(messages=messages)
+        if res and patch:
+            try:
+                patched_recipe = apply_patch(recipe_dict, refined_recipe)
+            except RecipePatchError as e:
+                # a rejected patch is not worth failing the recipe for, ask once more for the updated graph
+                self.logger.warning(f"Could not apply the graph patch, asking for the updated graph instead: {e}")
+                self.model_interface.discard_answer(messages)
+                return self.refine_graph(issues, recipe_dict, recipe_text, patch=False)
+            self.logger.info(f"Applied {len(refined_recipe) if isinstance(refined_recipe, list) else 1} patch operations to the graph")
+            return True, patched_recipe
+        if not res or not self.compact_prompts:
+            return res, refined_recipe
+        refined_recipe = expand_keys(refined_recipe)
+        if node_ids is None:
+            return res, {**recipe_dict, **refined_recipe}
+        return res, merge_subgraph(recipe_dict, subgraph, refined_recipe)
+
     def process_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
             issues = self.find_issues(recipe_dict=recipe_dict, recipe_text=recipe_text)
             if len(issues) > 0:
-                user_prompt = self.prompts.user_recipe_prompt(
-                    list_of_issues=issues,
-                    recipe_text=recipe_text,
-                    recipe_dict=recipe_dict,
-                )
-                messages = [
-                    {"role": "system", "content": self.prompts.system_prompt()},
-                    {"role": "user", "content": user_prompt},
-                    {"role": "assistant", "content": self.prompts.assistant_prompt()}
-                ]
-                res, refined_recipe = self.model_interface.get_structured_answer(messages=messages)
-                return res, refined_recipe
+                return self.refine_graph(issues, recipe_dict, recipe_text, patch=self.patch_responses)
             else:
                 self.logger.info("No issues found in recipe graph.")
                 return True, recipe_dict
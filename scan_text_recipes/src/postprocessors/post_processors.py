@@ -1,14 +1,22 @@
+import asyncio
 import copy
 from abc import abstractmethod
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Set, Union
 
 from scan_text_recipes.src import POST_PROCESSORS_PACKAGE_PATH, LOGGER_PACKAGE_PATH
 from scan_text_recipes.src.loop_container import LoopContainer
+from scan_text_recipes.src.model_interface.request_governor import token_stage
+from scan_text_recipes.src.stage_scheduler import run_stages
 from scan_text_recipes.utils.logger.basic_logger import BaseLogger
 from scan_text_recipes.utils.utils import load_or_create_instance
 
 
 class PostProcessor:
+    # recipe sections the stage reads and writes, None means the whole recipe;
+    # stages with disjoint sections may run concurrently (see stage_scheduler)
+    read_sections: Optional[Set[str]] = None
+    write_sections: Optional[Set[str]] = None
+
     def __init__(
             self, config: Dict = None, section_name: str = None, logger=None, **kwargs
     ):
@@ -23,6 +31,12 @@ class PostProcessor:
     def process_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
         raise NotImplementedError("Subclasses should implement this method.")
 
+    async def aprocess_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
+        """
+        Awaitable process_recipe, runs the blocking stage in a worker thread unless overridden.
+        """
+        return await asyncio.to_thread(self.process_recipe, recipe_dict=recipe_dict, recipe_text=recipe_text, **kwargs)
+
     @staticmethod
     def get_final_node_id(recipe_dict:Dict) -> Union[None, int]:
         node_num = [ingredient['id'] for ingredient in recipe_dict["ingredients"] if ingredient['name']]
@@ -37,9 +51,11 @@ class PostProcessorsLoopContainer(LoopContainer, PostProcessor):
     The class is initialized with the number of iterations
     segment_config is a list of dictionaries, each dictionary contains
     the configuration for a post-processor which are  in the loop
+    With concurrent=True, non-conflicting consecutive post-processors (by their declared sections) run concurrently.
     """
-    def __init__(self, iterations: int, segment_config: List[Dict], **kwargs):
+    def __init__(self, iterations: int, segment_config: List[Dict], concurrent: bool = False, **kwargs):
         PostProcessor.__init__(self, **kwargs)
+        self.concurrent = concurrent
 
         LoopContainer.__init__(
             self,
@@ -51,15 +67,33 @@ class PostProcessorsLoopContainer(LoopContainer, PostProcessor):
             **{key: val for key, val in kwargs.items() if key != "logger"}
         )
 
+    def _union_sections(self, attribute: str) -> Optional[Set[str]]:
+        sections = [getattr(processor, attribute, None) for processor in self.processors]
+        return None if any(section is None for section in sections) else set().union(*sections)
+
+    @property
+    def read_sections(self) -> Optional[Set[str]]:
+        return self._union_sections("read_sections")
+
+    @property
+    def write_sections(self) -> Optional[Set[str]]:
+        return self._union_sections("write_sections")
+
     def _copy_tmp_recipe(self, **kwargs) -> Dict:
         return copy.deepcopy(kwargs.get("recipe_dict"))
 
     def _run_loop(self, *args, **kwargs) -> [bool, Dict[str, List]]:
         recipe_dict: str = kwargs.get("recipe_dict")
         recipe_text = kwargs.get("recipe_text")
+        if self.concurrent:
+            res, recipe_dict = run_stages(self.processors, recipe_dict, recipe_text, self.logger)
+            if res:
+                self.logger.info(f"Finished post-processing the recipe")
+            return res, recipe_dict
         for processor in self.processors:
             self.logger.info(f"Running {processor.__class__.__name__} post-processor")
-            res, recipe_dict = processor.process_recipe(recipe_dict=recipe_dict, recipe_text=recipe_text)
+            with token_stage(processor.__class__.__name__):
+                res, recipe_dict = processor.process_recipe(recipe_dict=recipe_dict, recipe_text=recipe_text)
             if not res:
                 self.logger.error(f"Error in {processor.__class__.__name__}")
                 return False, recipe_dict
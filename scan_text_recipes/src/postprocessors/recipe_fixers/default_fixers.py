@@ -1,13 +1,15 @@
 import copy
 from inspect import isabstract
-from typing import Dict, List
+from typing import Dict, List, Union
 
 import dictdiffer
 
 from scan_text_recipes.src import RECIPE_FIXERS_PACKAGE_PATH, MODEL_INTERFACE_PACKAGE_PATH, PROMPTS_PACKAGE_PATH
 from scan_text_recipes.src.model_interface.remote_model_interface import ModelInterface, RemoteAPIModelInterface
 from scan_text_recipes.src.postprocessors.post_processors import PostProcessor
+from scan_text_recipes.src.postprocessors.recipe_patch import RecipePatchError, apply_patch, patch_instructions
 from scan_text_recipes.src.prompt_organizers.base_prompts_container import BasePromptsContainer
+from scan_text_recipes.src.prompt_organizers.compact_encoding import encode_compact, expand_keys
 from scan_text_recipes.src.prompt_organizers.fixer_prompt_container import DefaultRefinerPromptsContainer
 from scan_text_recipes.src.postprocessors.recipe_fixers.validation_methods import ValidationMethod
 from scan_text_recipes.src.unit_converters.units_extractor import UnitsHandler
@@ -18,6 +20,14 @@ from scan_text_recipes.utils.utils import list_it, read_model_config, load_or_cr
 
 
 class RemoveFakes(PostProcessor):
+    @property
+    def read_sections(self):
+        return {self.section_name, "edges"}
+
+    @property
+    def write_sections(self):
+        return {self.section_name, "edges"}
+
     def process_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
         recipe_dict_fixed = copy.deepcopy(recipe_dict)
         # remove fake keys (ingredients or rosources) from the recipe
@@ -52,8 +62,13 @@ class RecipeFixer(PostProcessor):
     Base class for recipe fixers.
     """
     def __init__(self, section_name: str, model_interface: ModelInterface,  language: str,
-                 refiner_prompts: BasePromptsContainer = None, setup_config: Dict = None, config: Dict = None, **kwargs):
+                 refiner_prompts: BasePromptsContainer = None, setup_config: Dict = None, config: Dict = None,
+                 compact_prompts: bool = True, patch_responses: bool = True, **kwargs):
         super().__init__(config, section_name, **kwargs)
+        # send only the entries to fix, as compact JSON (see compact_encoding)
+        self.compact_prompts = compact_prompts
+        # the model answers with patch operations on the section instead of the updated entries (see recipe_patch)
+        self.patch_responses = patch_responses
 
         self.model_interface = load_or_create_instance(
             model_interface, ModelInterface, MODEL_INTERFACE_PACKAGE_PATH, **kwargs
@@ -70,8 +85,21 @@ class RecipeFixer(PostProcessor):
             lambda x: issubclass(x, ValidationMethod) and not isabstract(x)
         )
 
-    def create_questions_user_prompt(self, recipe_dict: Dict[str, List], recipe_text: str) -> str:
+    @property
+    def read_sections(self):
+        return {self.section_name}
+
+    @property
+    def write_sections(self):
+        return {self.section_name}
+
+    def mark_section(self, recipe_dict: Dict[str, List]) -> [List[Dict], List[int]]:
+        """
+        Copy of the section with invalid fields replaced by refinement instructions (encapsulated in "$$$"),
+        and the indices of the entries that were marked.
+        """
         section = copy.deepcopy(recipe_dict[self.section_name])
+        marked_indices = set()
         for field in self.config['FIELDS']:
             for field_name in field:
                 for method in list_it(field[field_name]):
@@ -88,13 +116,91 @@ class RecipeFixer(PostProcessor):
                             instruction = getattr(self.validation_methods[method], 'refinement_instructions')(field_name, section_field['name'])
                             self.logger.warning(f'Adding refinement instruction: "{instruction}"')
                             section[sec_idx][field_name] = f"$$${instruction}$$$"
+                            marked_indices.add(sec_idx)
+        return section, sorted(marked_indices)
 
+    def create_questions_user_prompt(self, recipe_dict: Dict[str, List], recipe_text: str) -> str:
+        section, _ = self.mark_section(recipe_dict)
         return self.prompts.user_recipe_prompt(
             section_name=self.section_name,
             section=section,
             recipe_text=recipe_text,
+            response_format=self.response_format(),
         )
 
+    def create_compact_user_prompt(self, section: List[Dict], marked_indices: List[int], recipe_text: str) -> str:
+        encoded_entries, keys_legend = encode_compact([section[idx] for idx in marked_indices])
+        return self.prompts.user_recipe_prompt(
+            section_name=self.section_name,
+            section=encoded_entries,
+            legend=keys_legend,
+            recipe_text=recipe_text,
+            response_format=self.response_format(),
+        )
+
+    def response_format(self) -> Union[None, str]:
+        return patch_instructions([self.section_name]) if self.patch_responses else None
+
+    def create_messages(self, user_prompt: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.prompts.system_prompt()},
+            {"role": "user", "content": user_prompt},
+            {"role": "assistant", "content": self.prompts.assistant_prompt(patch=self.patch_responses)}
+        ]
+
+    def apply_answer(self, recipe_dict: Dict[str, List], answer, marked_indices: List[int]) -> Dict[str, List]:
+        """
+        Patch responses: the answer holds patch operations on the section, raises RecipePatchError if they do not apply.
+        Full prompts: the answer replaces the section. Compact prompts: the answer holds the marked entries only,
+        merged into the section by id (by order for entries without a known id).
+        """
+        if self.patch_responses:
+            return apply_patch(recipe_dict, answer, allowed_sections={self.section_name})
+        refined_recipe = copy.deepcopy(recipe_dict)
+        if not self.compact_prompts:
+            refined_recipe[self.section_name] = answer
+            return refined_recipe
+        answer = expand_keys(answer)
+        if isinstance(answer, dict):
+            answer = answer.get(self.section_name, [answer])
+        section = refined_recipe[self.section_name]
+        index_by_id = {section[idx].get("id"): idx for idx in marked_indices}
+        for order, entry in enumerate(answer):
+            if not isinstance(entry, dict):
+                continue
+            idx = index_by_id.get(entry.get("id"), marked_indices[order] if order < len(marked_indices) else None)
+            if idx is not None:
+                section[idx] = {**section[idx], **entry}
+        return refined_recipe
+
+    def apply_model_answer(
+            self, recipe_dict: Dict[str, List], answer, marked_indices: List[int], messages: List[Dict]
+    ) -> [bool, Dict[str, List]]:
+        try:
+            return True, self.apply_answer(recipe_dict, answer, marked_indices)
+        except RecipePatchError as e:
+            # keep the section as it is rather than failing the recipe
+            self.logger.warning(f"Could not apply the {self.section_name} patch, keeping the section unchanged: {e}")
+            self.model_interface.discard_answer(messages)
+            return True, recipe_dict
+
+    def prepare_messages(self, recipe_dict: Dict[str, List], recipe_text: str) -> [List[Dict], List[int]]:
+        """
+        Messages asking to fix the section (None if there is nothing to fix), and what handle_answer needs
+        to apply the answer (here the marked indices).
+        """
+        if not self.compact_prompts:
+            return self.create_messages(self.create_questions_user_prompt(recipe_dict, recipe_text)), []
+        section, marked_indices = self.mark_section(recipe_dict)
+        if not marked_indices:
+            return None, []
+        return self.create_messages(self.create_compact_user_prompt(section, marked_indices, recipe_text)), marked_indices
+
+    def handle_answer(self, recipe_dict: Dict[str, List], res: bool, answer, messages: List[Dict], marked_indices) -> [bool, Dict[str, List]]:
+        if not res:
+            return res, recipe_dict
+        return self.apply_model_answer(recipe_dict, answer, marked_indices, messages)
+
     def process_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
         """
         Refine the recipe.
@@ -102,15 +208,21 @@ class RecipeFixer(PostProcessor):
         :param recipe_text: Original text.
         :return: Refined recipe.
         """
-        messages = [
-            {"role": "system", "content": self.prompts.system_prompt()},
-            {"role": "user", "content": self.create_questions_user_prompt(recipe_dict, recipe_text)},
-            {"role": "assistant", "content": self.prompts.assistant_prompt()}
-        ]
-        res, refined_section = self.model_interface.get_structured_answer(messages=messages)
-        refined_recipe = copy.deepcopy(recipe_dict)
-        refined_recipe[self.section_name] = refined_section
-        return res, refined_recipe
+        messages, context = self.prepare_messages(recipe_dict, recipe_text)
+        if messages is None:
+            self.logger.info(f"No issues found in {self.section_name}.")
+            return True, recipe_dict
+        res, answer = self.model_interface.get_structured_answer(messages=messages)
+        return self.handle_answer(recipe_dict, res, answer, messages, context)
+
+    async def aprocess_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
+        # same steps as process_recipe, only the model request is awaited
+        messages, context = self.prepare_messages(recipe_dict, recipe_text)
+        if messages is None:
+            self.logger.info(f"No issues found in {self.section_name}.")
+            return True, recipe_dict
+        res, answer = await self.model_interface.aget_structured_answer(messages=messages)
+        return self.handle_answer(recipe_dict, res, answer, messages, context)
 
 
 class IngredientRecipeFixer(RecipeFixer):
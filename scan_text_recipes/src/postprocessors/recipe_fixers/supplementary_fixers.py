@@ -82,23 +82,22 @@ class SupplementaryRecipeFixer(RecipeFixer):
         )
         return answer, questions
 
-    def process_recipe(self, recipe_dict: Dict[str, List], recipe_text: str, **kwargs) -> [bool, Dict[str, List]]:
-        """
-        Refine the recipe.
-        :param recipe_dict: Structured recipe.
-        :param recipe_text: Original text.
-        :return: Refined recipe.
-        """
-        user_prompts, questions = self.create_questions_user_prompt(recipe_dict, recipe_text)
-        if len(questions) == 0:
-            self.logger.info(f"No issues found in recipe.")
-            return True, recipe_dict
-        messages = [
+    def create_messages(self, user_prompts: str) -> List[Dict]:
+        return [
             {"role": "system", "content": self.prompts.system_prompt()},
             {"role": "user", "content": user_prompts},
             {"role": "assistant", "content": self.prompts.assistant_prompt()}
         ]
-        res, answers = self.model_interface.get_structured_answer(messages=messages)
+
+    def prepare_messages(self, recipe_dict: Dict[str, List], recipe_text: str) -> [List[Dict], List[SupplementaryPromptQuestion]]:
+        user_prompts, questions = self.create_questions_user_prompt(recipe_dict, recipe_text)
+        if len(questions) == 0:
+            return None, questions
+        return self.create_messages(user_prompts), questions
+
+    def handle_answer(
+            self, recipe_dict: Dict[str, List], res: bool, answers, messages: List[Dict], questions: List[SupplementaryPromptQuestion]
+    ) -> [bool, Dict[str, List]]:
         self.logger.info(f"Model response: {answers}")
         recipe_dict = self.create_updated_recipe_dict(answers, questions, recipe_dict)
         return res, recipe_dict
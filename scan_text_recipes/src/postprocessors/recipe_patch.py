@@ -0,0 +1,134 @@
+import copy
+from typing import Any, Dict, Iterable, List, Tuple
+
+from scan_text_recipes.src.prompt_organizers.compact_encoding import LONG_KEYS, expand_keys
+
+# JSON-Patch style edits of a recipe, addressed by node id (and by "<from>-<to>" for edges) rather than by list index,
+# so the model answers with a handful of operations instead of regenerating a whole section or graph:
+#   {"op": "replace", "path": "/ingredients/3/quantity", "value": 200}
+#   {"op": "add", "path": "/ingredients/-", "value": {"id": 12, "name": ...}}
+#   {"op": "remove", "path": "/resources/5"}            (also removes the edges of the node)
+#   {"op": "add", "path": "/edges/-", "value": {"from": 3, "to": 5}}
+#   {"op": "remove", "path": "/edges/3-5"}
+#   {"op": "replace", "path": "/edges/3-5/instructions", "value": ...}
+
+NODE_SECTIONS = ("ingredients", "resources")
+OPERATIONS = ("add", "replace", "remove")
+
+
+class RecipePatchError(ValueError):
+    """
+    Raised for a patch that is malformed or does not apply to the recipe; the recipe is left unchanged.
+    """
+
+
+def patch_instructions(sections: Iterable[str] = (*NODE_SECTIONS, "edges")) -> str:
+    sections = list(sections)
+    return f"""
+            - **Respond only with a JSON list of patch operations** for the changes, not with the whole {"/".join(sections)}.
+            - Operations: {{"op": "replace", "path": "/<section>/<id>/<field>", "value": ...}} to change a field,
+              {{"op": "add", "path": "/<section>/-", "value": {{...}}}} to add an item (new nodes need a new unique id),
+              {{"op": "remove", "path": "/<section>/<id>"}} to remove an item.
+            - Sections: {", ".join(sections)}. Edges are addressed as "<from id>-<to id>", e.g. "/edges/3-5".
+            - "id", "from" and "to" can not be changed, and a whole item can not be replaced, only its fields.
+              To rewire an edge, remove it and add the new one, e.g. {{"op": "remove", "path": "/edges/3-5"}}
+              and {{"op": "add", "path": "/edges/-", "value": {{"from": 3, "to": 7, "instructions": ...}}}}.
+            - Respond with an empty list if nothing has to change.
+        """
+
+
+def _long_name(segment: str) -> str:
+    return LONG_KEYS.get(segment, segment)
+
+
+def parse_path(path: str) -> Tuple[str, str, str]:
+    """
+    "/<section>/<target>[/<field>]" -> (section, target, field or None). Short keys are accepted.
+    """
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise RecipePatchError(f"Invalid path: {path!r}")
+    segments = path[1:].split("/")
+    if len(segments) not in (2, 3) or not all(segments):
+        raise RecipePatchError(f"Invalid path: {path!r}")
+    section, target = _long_name(segments[0]), segments[1]
+    field = _long_name(segments[2]) if len(segments) == 3 else None
+    return section, target, field
+
+
+def _find_node(recipe_dict: Dict[str, List], section: str, node_id: str) -> Dict:
+    for node in recipe_dict[section]:
+        if str(node.get("id")) == node_id:
+            return node
+    raise RecipePatchError(f"No node {node_id} in {section}")
+
+
+def _find_edge(recipe_dict: Dict[str, List], edge_id: str) -> Dict:
+    for edge in recipe_dict["edges"]:
+        if f"{edge.get('from')}-{edge.get('to')}" == edge_id:
+            return edge
+    raise RecipePatchError(f"No edge {edge_id}")
+
+
+def _node_ids(recipe_dict: Dict[str, List]) -> set:
+    return {str(node.get("id")) for section in NODE_SECTIONS for node in recipe_dict.get(section, [])}
+
+
+def _apply_operation(recipe: Dict[str, List], operation: Dict):
+    op, path = operation.get("op"), operation.get("path")
+    if op not in OPERATIONS:
+        raise RecipePatchError(f"Unsupported operation: {op!r}")
+    section, target, field = parse_path(path)
+    if section not in recipe or not isinstance(recipe[section], list):
+        raise RecipePatchError(f"Unknown section: {section}")
+    if op != "remove" and "value" not in operation:
+        raise RecipePatchError(f"Missing value: {path}")
+    value = expand_keys(operation.get("value"))
+
+    if target == "-":  # append an item
+        if op != "add" or field is not None or not isinstance(value, dict):
+            raise RecipePatchError(f"Only whole items can be added to {path}")
+        if section == "edges":
+            if str(value.get("from")) not in _node_ids(recipe) or str(value.get("to")) not in _node_ids(recipe):
+                raise RecipePatchError(f"Edge between unknown nodes: {value.get('from')}-{value.get('to')}")
+        elif value.get("id") is None or str(value["id"]) in _node_ids(recipe):
+            raise RecipePatchError(f"New node needs a new unique id: {value.get('id')!r}")
+        recipe[section].append(value)
+        return
+
+    item = _find_edge(recipe, target) if section == "edges" else _find_node(recipe, section, target)
+    if field is None:
+        if op == "remove":
+            recipe[section].remove(item)
+            if section != "edges":  # no dangling edges
+                recipe["edges"] = [edge for edge in recipe.get("edges", []) if target not in (str(edge.get("from")), str(edge.get("to")))]
+        else:
+            raise RecipePatchError(f"Replace fields of {path} one by one")
+    elif field in ("id", "from", "to"):
+        raise RecipePatchError(f"Ids can not be changed: {path}")
+    elif op == "remove":
+        item.pop(field, None)
+    else:
+        item[field] = value
+
+
+def apply_patch(recipe_dict: Dict[str, List], operations: Any, allowed_sections: Iterable[str] = None) -> Dict[str, List]:
+    """
+    Validates and applies the operations, in order, to a copy of the recipe.
+    Raises RecipePatchError (naming the failing operation) if any operation is invalid, so no partial patch is applied.
+    """
+    if isinstance(operations, dict):
+        operations = operations.get("patch", operations.get("operations", [operations]))
+    if not isinstance(operations, list):
+        raise RecipePatchError(f"Patch should be a list of operations, got {type(operations).__name__}")
+    allowed_sections = set(allowed_sections) if allowed_sections is not None else None
+    recipe = copy.deepcopy(recipe_dict)
+    for idx, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise RecipePatchError(f"Operation {idx} is not an object")
+        try:
+            if allowed_sections is not None and parse_path(operation.get("path"))[0] not in allowed_sections:
+                raise RecipePatchError(f"Section not allowed: {operation.get('path')}")
+            _apply_operation(recipe, operation)
+        except RecipePatchError as e:
+            raise RecipePatchError(f"Operation {idx} ({operation}): {e}") from e
+    return recipe
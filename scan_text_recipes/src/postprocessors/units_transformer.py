@@ -8,6 +8,9 @@ from scan_text_recipes.utils.utils import read_yaml
 
 
 class UnitsTransformer(PostProcessor, UnitsHandler):
+    read_sections = {"ingredients"}
+    write_sections = {"ingredients"}
+
     def __init__(self, setup_config: Union[str, Dict[str, Dict[str, str]]], language: str = None, **kwargs):
         super().__init__(**kwargs)
         self.setup_config = setup_config if isinstance(setup_config, dict) else read_yaml(setup_config)
@@ -93,8 +93,9 @@ class TextSimplifier(PreProcessor):
         """
         Simplify the recipe text.
         """
-        if self.model_interface.get_number_of_tokens_from_the_text(recipe_text) > self.max_tokens:
-            self.logger.log(f"Recipe text is too long ({self.max_tokens} tokens), simplifying...")
+        number_of_tokens = self.model_interface.get_number_of_tokens_from_the_text(recipe_text)
+        if number_of_tokens > self.max_tokens:
+            self.logger.log(f"Recipe text is too long ({number_of_tokens} > {self.max_tokens} tokens), simplifying...")
             # Simplify the text using the model interface
             simple_text = self.model_interface.get_text_answer(
                 messages=[
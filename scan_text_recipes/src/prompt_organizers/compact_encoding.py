@@ -0,0 +1,140 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Compact serialization of recipes for prompts: minified JSON with short keys (explained by a legend),
+# a stable ordering of keys and items, and subgraphs holding only the nodes and edges relevant to an issue.
+# Fewer input tokens per round trip, and identical prompts for identical recipes (response and prefix caching).
+
+SHORT_KEYS = {
+    "ingredients": "I",
+    "resources": "R",
+    "edges": "E",
+    "id": "i",
+    "name": "n",
+    "quantity": "q",
+    "units": "u",
+    "instructions": "x",
+    "intermediate": "m",
+    "usage_time": "ut",
+    "temperature": "tc",
+    "from": "f",
+    "to": "t",
+}
+LONG_KEYS = {short: long for long, short in SHORT_KEYS.items()}
+KEY_ORDER = {key: order for order, key in enumerate(SHORT_KEYS)}
+SECTIONS = ("ingredients", "resources")
+
+
+def _ordered_items(data: Dict) -> List:
+    return sorted(data.items(), key=lambda item: (KEY_ORDER.get(item[0], len(KEY_ORDER)), item[0]))
+
+
+def _sort_key(item: Any):
+    if isinstance(item, dict) and "from" in item and "to" in item:
+        return 0, str(item["from"]), str(item["to"])
+    if isinstance(item, dict) and "id" in item:
+        return 0, str(item["id"]).zfill(8), ""
+    return 1, "", ""
+
+
+def shorten_keys(data: Any, used_keys: Set[str] = None) -> Any:
+    """
+    Replaces the known keys by their short form, recursively, in a stable order.
+    Lists of nodes and edges are sorted by id (by from and to for edges).
+    """
+    if isinstance(data, dict):
+        if used_keys is not None:
+            used_keys.update(key for key in data if key in SHORT_KEYS)
+        return {SHORT_KEYS.get(key, key): shorten_keys(value, used_keys) for key, value in _ordered_items(data)}
+    if isinstance(data, list):
+        items = [shorten_keys(item, used_keys) for item in data]
+        if all(isinstance(item, dict) for item in data):
+            items = [item for _, item in sorted(zip(map(_sort_key, data), items), key=lambda pair: pair[0])]
+        return items
+    return data
+
+
+def expand_keys(data: Any) -> Any:
+    """
+    Inverse of shorten_keys, used on the model answers.
+    """
+    if isinstance(data, dict):
+        return {LONG_KEYS.get(key, key): expand_keys(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [expand_keys(item) for item in data]
+    return data
+
+
+def legend(used_keys: Iterable[str]) -> str:
+    return ", ".join(f"{SHORT_KEYS[key]}={key}" for key in sorted(used_keys, key=KEY_ORDER.get))
+
+
+def encode_compact(data: Any) -> [str, str]:
+    """
+    Minified short-keyed JSON of data and the legend of the keys it uses.
+    """
+    used_keys = set()
+    encoded = json.dumps(shorten_keys(data, used_keys), ensure_ascii=False, separators=(",", ":"))
+    return encoded, legend(used_keys)
+
+
+def relevant_subgraph(recipe_dict: Dict[str, List], node_ids: Optional[Iterable]) -> Dict[str, List]:
+    """
+    The nodes of node_ids, the edges touching them and the nodes at the other end of these edges.
+    None node_ids means the whole recipe.
+    """
+    if node_ids is None:
+        return {key: recipe_dict.get(key, []) for key in (*SECTIONS, "edges")}
+    node_ids = set(node_ids)
+    edges = [edge for edge in recipe_dict.get("edges", []) if edge.get("from") in node_ids or edge.get("to") in node_ids]
+    included = node_ids | {edge.get("from") for edge in edges} | {edge.get("to") for edge in edges}
+    subgraph = {section: [node for node in recipe_dict.get(section, []) if node.get("id") in included] for section in SECTIONS}
+    subgraph["edges"] = edges
+    return subgraph
+
+
+def next_free_id(recipe_dict: Dict[str, List]) -> int:
+    """
+    The smallest integer id above the ids of all nodes of the recipe, to be given to new nodes.
+    """
+    node_ids = [node.get("id") for section in SECTIONS for node in recipe_dict.get(section, [])]
+    return max((node_id for node_id in node_ids if isinstance(node_id, int)), default=0) + 1
+
+
+def merge_subgraph(recipe_dict: Dict[str, List], sent: Dict[str, List], refined: Dict[str, List]) -> Dict[str, List]:
+    """
+    Merges a refined subgraph (the model answer to relevant_subgraph) back into the recipe:
+    sent nodes are updated by id, other nodes of the answer are added, and the sent edges are replaced by the refined ones.
+    The model does not see the nodes outside the subgraph, so an answer node reusing the id of such a node is a new node:
+    it is given a free id (in the refined edges too) rather than overwriting the unsent node.
+    Sent nodes missing from the answer are kept.
+    """
+    sent_ids = {node.get("id") for section in SECTIONS for node in sent.get(section, [])}
+    unsent_ids = {node.get("id") for section in SECTIONS for node in recipe_dict.get(section, [])} - sent_ids
+    new_ids, next_id = {}, next_free_id(recipe_dict)
+    for section in SECTIONS:
+        for node in refined.get(section, []):
+            if isinstance(node, dict) and node.get("id") in unsent_ids and node.get("id") not in new_ids:
+                new_ids[node.get("id")], next_id = next_id, next_id + 1
+
+    merged = {key: value for key, value in recipe_dict.items()}
+    for section in SECTIONS:
+        refined_nodes = {}
+        for node in refined.get(section, []):
+            if isinstance(node, dict):
+                node = {**node, "id": new_ids[node["id"]]} if node.get("id") in new_ids else node
+                refined_nodes[node.get("id")] = node
+        nodes = []
+        for node in recipe_dict.get(section, []):
+            node_id = node.get("id")
+            nodes.append({**node, **refined_nodes.pop(node_id)} if node_id in sent_ids and node_id in refined_nodes else node)
+        merged[section] = nodes + list(refined_nodes.values())
+    sent_edges = {(edge.get("from"), edge.get("to")) for edge in sent.get("edges", [])}
+    refined_edges = [
+        {**edge, "from": new_ids.get(edge.get("from"), edge.get("from")), "to": new_ids.get(edge.get("to"), edge.get("to"))}
+        for edge in refined.get("edges", []) if isinstance(edge, dict)
+    ]
+    merged["edges"] = [
+        edge for edge in recipe_dict.get("edges", []) if (edge.get("from"), edge.get("to")) not in sent_edges
+    ] + refined_edges
+    return merged
@@ -8,11 +8,23 @@ class DefaultRefinerPromptsContainer(DefaultPromptsContainer):
     def user_recipe_prompt(recipe_text: str, **kwargs) -> str:
         section_name: str = kwargs.get('section_name')
         section: List[Dict] = kwargs.get('section')
+        keys_legend = kwargs.get('legend')
+        response_format = kwargs.get('response_format')  # e.g. patch instructions, instead of the updated entries
+        if keys_legend:
+            # compact encoding: section is short-keyed JSON of the entries to fix only
+            return f"""
+            I have an extracted structured response, but some {section_name} fields are missing or incorrect.
+            Please complete the missing values based on the original text.
+            Here are the {section_name} entries to fix, as JSON with short keys ({keys_legend}): {section}
+            Here is the original text: [{recipe_text}].
+            {response_format or "Respond with these entries only, using the same short keys and keeping their ids."}
+        """
         refinement_prompt = f"""
             I have an extracted structured response, but some {section_name} fields are missing or incorrect.
             Please complete the missing values based on the original text.
             Here is the structured response: {{{section}}}.
             Here is the original text: [{recipe_text}].
+            {response_format or ""}
         """
         return refinement_prompt
 
@@ -26,6 +38,6 @@ class DefaultRefinerPromptsContainer(DefaultPromptsContainer):
             - Address fields encapsulated in "$$$" and fix the values according to instructions.
             - Preserve the existing structure.
             - If value not found, leave the field empty.
-            - **Respond only with the updated JSON**.
+            - **Respond only with the {"patch operations" if kwargs.get("patch") else "updated JSON"}**.
             - Field names should be in english, but the values should be in the original language of the recipe.
             """
@@ -17,6 +17,21 @@ class GraphEdgesPromptsContainer(DefaultPromptsContainer):
         recipe_dict = kwargs.get('recipe_dict')
         problems = "\n- ".join([issue.problem for issue in list_of_issues])
         solutions = "\n- ".join([issue.solution for issue in list_of_issues])
+        keys_legend = kwargs.get('legend')
+        response_format = kwargs.get('response_format')  # e.g. patch instructions, instead of the updated JSON
+        if keys_legend:
+            # compact encoding: recipe_dict is short-keyed JSON (of the relevant subgraph only if partial)
+            graph_part = "the part of the graph involved in the issues" if kwargs.get('partial') else "the graph"
+            return f"""
+            Here is a recipe and a recipe graph. The graph has some issues:
+            Please address these issues: {problems}
+            These are the required solutions: {solutions}
+            Here is {graph_part}, as JSON with short keys ({keys_legend}): ***\n{recipe_dict}\n***.
+            Here is the original text: ***\n{recipe_text}***\n.
+            {response_format or f"- **Respond only with the updated JSON of {graph_part}, using the same short keys** Do not add any explanations or instructions."}
+            - Keep the ids of existing nodes. New nodes need new unique ids{f", starting from {kwargs['next_id']} (lower ids are taken, also by nodes not shown)" if kwargs.get('next_id') is not None else ""}.
+            - Field names should be in english, but the values should be in the original language of the recipe.
+        """
         refinement_prompt = f"""
             "Here is a recipe and a recipe graph. The graph has some issues:
             
@@ -25,7 +40,7 @@ class GraphEdgesPromptsContainer(DefaultPromptsContainer):
             Here is the graph: ***\n{recipe_dict}\n***.
             Here is the original text: ***\n{recipe_text}***\n.
             
-            - **Respond only with the updated JSON** Do not add any explanations or instructions.
+            {response_format or "- **Respond only with the updated JSON** Do not add any explanations or instructions."}
             - Field names should be in english, but the values should be in the original language of the recipe.
         """
         return refinement_prompt
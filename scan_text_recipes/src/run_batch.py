@@ -0,0 +1,116 @@
+from pathlib import Path
+from dotenv import load_dotenv
+
+env_path = Path(__file__).resolve().parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+import boto3
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List
+
+# Add the repo root (parent of client_boarding) to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scan_text_recipes.utils.paths import PROJECT_ROOT
+from scan_text_recipes.src.model_interface.remote_model_interface import ModelInterface
+from scan_text_recipes.src.run_pipeline import ReadRecipePipeline
+from scan_text_recipes.utils.logger.basic_logger import dish_context
+from scan_text_recipes.utils.utils import read_text
+
+
+def list_recipe_sources(source: str) -> Dict[str, Callable[[], str]]:
+    """
+    Lists the recipe texts (*.txt) of a local directory or an S3 prefix (s3://bucket/prefix).
+    :return: dish name -> function loading the recipe text
+    """
+    if source.startswith("s3://"):
+        bucket_name, _, prefix = source[len("s3://"):].partition("/")
+        s3_client = boto3.client('s3')
+        recipes = {}
+        for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            for item in page.get("Contents", []):
+                if item["Key"].endswith(".txt"):
+                    recipes[os.path.splitext(os.path.basename(item["Key"]))[0]] = (
+                        lambda key=item["Key"]: s3_client.get_object(Bucket=bucket_name, Key=key)["Body"].read().decode("utf-8")
+                    )
+        return recipes
+    return {
+        os.path.splitext(file_name)[0]: (lambda path=os.path.join(source, file_name): read_text(path))
+        for file_name in sorted(os.listdir(source)) if file_name.endswith(".txt")
+    }
+
+
+def process_dish(pipeline: ReadRecipePipeline, dish_name: str, load_text: Callable[[], str], save_to_db: bool = True) -> bool:
+    with dish_context(dish_name):
+        return _process_dish(pipeline, dish_name, load_text, save_to_db)
+
+
+def _process_dish(pipeline: ReadRecipePipeline, dish_name: str, load_text: Callable[[], str], save_to_db: bool = True) -> bool:
+    recipe_text = load_text()
+    res, recipe_dict = pipeline.run_pipeline(recipe_text)
+    if not res:
+        pipeline.logger.error("Failed to process recipe: %s", dish_name)
+        return False
+    pipeline.save_structured_recipe(recipe_dict=recipe_dict, dish_name=dish_name)
+    if save_to_db:
+        pipeline.save_recipe_to_db(recipe_dict=recipe_dict, recipe_text=recipe_text, dish_name=dish_name)
+    return True
+
+
+def run_batch(
+        pipeline: ReadRecipePipeline,
+        source: str,
+        max_workers: int = 4,
+        max_concurrent_requests: int = None,
+        save_to_db: bool = True
+) -> Dict[str, List[str]]:
+    """
+    Processes all recipe texts of a directory or an S3 prefix with a single pipeline,
+    max_workers recipes at a time and at most max_concurrent_requests model requests in flight.
+    :return: {"succeeded": [...], "failed": [...]} dish names
+    """
+    ModelInterface.set_max_concurrent_requests(max_concurrent_requests)
+    recipes = list_recipe_sources(source)
+    pipeline.logger.info("Processing %s recipes from %s (%s workers)", len(recipes), source, max_workers)
+    summary = {"succeeded": [], "failed": []}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recipe") as executor:
+        futures = {
+            executor.submit(process_dish, pipeline, dish_name, load_text, save_to_db): dish_name
+            for dish_name, load_text in recipes.items()
+        }
+        for future in as_completed(futures):
+            dish_name = futures[future]
+            try:
+                succeeded = future.result()
+            except Exception as e:
+                pipeline.logger.error("Error processing recipe %s: %s", dish_name, e)
+                succeeded = False
+            summary["succeeded" if succeeded else "failed"].append(dish_name)
+    pipeline.logger.info(
+        "Finished batch: %s succeeded, %s failed in %.1f seconds",
+        len(summary["succeeded"]), len(summary["failed"]), time.time() - start_time
+    )
+    return summary
+
+
+if __name__ == '__main__':
+    # Client - related information
+    client_name = os.environ.get("CLIENT_NAME")
+    client_config = os.path.join(PROJECT_ROOT, "client_configs", client_name, "client_config.yaml")
+    # Batch - related information: directory or s3://bucket/prefix of recipe texts
+    batch_source = os.environ.get("BATCH_SOURCE", os.path.join(PROJECT_ROOT, "..", "recipes", client_name))
+    max_concurrent_requests = os.environ.get("MAX_CONCURRENT_REQUESTS")
+
+    # Initialize pipeline once for all the recipes
+    pipeline = ReadRecipePipeline(client_config, client_name=client_name)
+    batch_summary = run_batch(
+        pipeline,
+        batch_source,
+        max_workers=int(os.environ.get("BATCH_MAX_WORKERS", 4)),
+        max_concurrent_requests=int(max_concurrent_requests) if max_concurrent_requests else None,
+        save_to_db=os.environ.get("BATCH_SAVE_TO_DB", "true").lower() == "true",
+    )
+    sys.exit(0 if not batch_summary["failed"] else 1)
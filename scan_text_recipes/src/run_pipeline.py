@@ -8,7 +8,8 @@ load_dotenv(dotenv_path=env_path)
 import boto3
 
 import os
-from typing import Dict
+import threading
+from typing import Callable, Dict
 import sys
 
 # Add the repo root (parent of client_boarding) to sys.path
@@ -18,8 +19,10 @@ from scan_text_recipes.src import PRE_PROCESSORS_PACKAGE_PATH, MAIN_PROCESSORS_P
     POST_PROCESSORS_PACKAGE_PATH, DB_PACKAGE_PATH, LOGGER_PACKAGE_PATH
 from scan_text_recipes.src.db_interface.db_interface import BaseDatabaseInterface
 from scan_text_recipes.src.main_processors.recipe_formatter import BaseMainProcessor
+from scan_text_recipes.src.model_interface.request_governor import TokenBudget, TokenBudgetExceeded, token_stage
 from scan_text_recipes.src.postprocessors.recipe_fixers.default_fixers import PostProcessor
 from scan_text_recipes.src.preprocessors.preprocessors import PreProcessor
+from scan_text_recipes.src.stage_scheduler import run_stages
 from scan_text_recipes.utils.logger.basic_logger import BaseLogger
 # from scan_text_recipes.tests.examples_for_tests import load_unstructured_text_test_recipe, load_structured_test_recipe
 from scan_text_recipes.utils.utils import read_jinja_config, read_yaml, initialize_pipeline_segments, read_text, \
@@ -29,8 +32,6 @@ from scan_text_recipes.utils.visualize_recipe import create_recipe_graph
 
 class ReadRecipePipeline:
     bucket_name = None
-    input_key = None
-    output_key = None
     s3_client = None
 
     def __init__(
@@ -38,8 +39,13 @@ class ReadRecipePipeline:
             client_config_path: str,    # path to the bundle config, user-related config
             pipeline_config_path: str = None,  # processing pipeline config, lists of available post, pre and main processors
             model_config_path: str = None,  # LLM properties configuration file
-            logger: BaseLogger = None
+            logger: BaseLogger = None,
+            client_name: str = None,
+            partial_results_callback: Callable = None  # (section name, items so far) while answers are streamed
     ):
+        self.client_name = client_name if client_name else os.environ.get("CLIENT_NAME")
+        # model interfaces read the default model config unless a model config is given
+        model_interfaces_config_path = model_config_path
         # read jinja config
         pipeline_config_path = pipeline_config_path if pipeline_config_path else os.path.join(PROJECT_ROOT, "config", "pipeline_config.yaml")
         model_config_path = model_config_path if model_config_path else os.path.join(PROJECT_ROOT, "config", "model_config.yaml")
@@ -47,7 +53,13 @@ class ReadRecipePipeline:
         # Init Pipeline Config
         self.client_pipeline_config = read_jinja_config(pipeline_config_path, client_config_path)
         pipeline_segments = self.client_pipeline_config.pop('PROCESSING_PIPELINE')
+        # run non-conflicting post-processors concurrently (by their declared recipe sections)
+        self.concurrent_post_processors = pipeline_segments.get('CONCURRENT_POST_PROCESSORS', False)
         db_interface_config = self.client_pipeline_config.pop('DATABASE_INTERFACE')
+        if partial_results_callback is not None:
+            self.client_pipeline_config['partial_results_callback'] = partial_results_callback
+        if model_interfaces_config_path is not None:
+            self.client_pipeline_config['model_config_path'] = model_interfaces_config_path
 
         # Init Logger
         if 'logger' in self.client_pipeline_config:
@@ -90,41 +102,71 @@ class ReadRecipePipeline:
             db_interface_config, BaseDatabaseInterface, DB_PACKAGE_PATH,
             **self.client_pipeline_config
         )
+        # the database connection (cursor) is shared by concurrent runs, see run_batch
+        self._db_lock = threading.Lock()
 
     def init_aws(self):
-        client_name = os.environ.get("CLIENT_NAME")
-        dish_name = os.environ.get("DISH_NAME")
         self.bucket_name = os.environ.get("S3_BUCKET")
-
-        # S3 Paths
-        client_prefix = f"{client_name}/"
-        self.input_key = f"{client_prefix}original_recipes/{dish_name}.txt"
-        self.output_key = f"{client_prefix}structured_recipes/{dish_name}.yaml"
         self.s3_client = boto3.client('s3')
 
+    # S3 Paths
+    def get_input_key(self, dish_name: str) -> str:
+        return f"{self.client_name}/original_recipes/{dish_name}.txt"
+
+    def get_output_key(self, dish_name: str) -> str:
+        return f"{self.client_name}/structured_recipes/{dish_name}.yaml"
+
     def run_pipeline(self, recipe_text: str) -> [bool, Dict]:
         """
             Run the pipeline on the given recipe dictionary and text.
         """
+        recipe_dict = {}
+        token_budget = TokenBudget(self.model_config.get('TOKEN_BUDGET_PER_RECIPE'))
+        try:
+            with token_budget:
+                res, recipe_dict = self._run_pipeline(recipe_text)
+            return res, recipe_dict
+        except TokenBudgetExceeded as e:
+            self.logger.error(f'Aborting recipe: {e}')
+            return False, recipe_dict
+        finally:
+            self.log_token_metrics(token_budget)
+            self.logger.flush()  # loggers may buffer or throttle their output
+
+    def log_token_metrics(self, token_budget: TokenBudget):
+        for stage_name, tokens in token_budget.stage_tokens.items():
+            self.logger.info("Tokens used by %s: %s", stage_name, tokens)
+        self.logger.info("Tokens used: %s", token_budget.used_tokens)
+
+    def _run_pipeline(self, recipe_text: str) -> [bool, Dict]:
         # Run all preprocessor
         original_text = recipe_text
         self.logger.info(f'Running Pre-Processors on textual data:')
         for pre_processor in self.pre_processors:
-            res, recipe_text = pre_processor.process_recipe(recipe_text)
+            with token_stage(pre_processor.__class__.__name__):
+                res, recipe_text = pre_processor.process_recipe(recipe_text)
             if not res:
                 return False, {}
         # Run the main processor
         self.logger.info(f'Running Main Processor (text to structured recipe):')
-        res, recipe_dict = self.main_processor.process_recipe(recipe_text)
+        with token_stage(self.main_processor.__class__.__name__):
+            res, recipe_dict = self.main_processor.process_recipe(recipe_text)
         if not res:
             return False, recipe_dict
         # recipe_dict = load_structured_test_recipe()
 
         # Run all postprocessors
         self.logger.info(f'Running Post-Processors on structured recipe:')
+        if self.concurrent_post_processors:
+            res, recipe_dict = run_stages(self.post_processors, recipe_dict, original_text, self.logger)
+            if not res:
+                return False, recipe_dict
+            self.logger.log(f'Finished processing recipe')
+            return res, recipe_dict
         for post_processor in self.post_processors:
             self.logger.warning(f'Running: {post_processor.__class__.__name__}')
-            res, recipe_dict = post_processor.process_recipe(recipe_dict=recipe_dict, recipe_text=original_text)
+            with token_stage(post_processor.__class__.__name__):
+                res, recipe_dict = post_processor.process_recipe(recipe_dict=recipe_dict, recipe_text=original_text)
             if not res:
                 return False, recipe_dict
         # Save processed recipe to database
@@ -136,9 +178,10 @@ class ReadRecipePipeline:
         Save the processed recipe to the database.
         """
         # Save the recipe to the database
-        self.db_interface.insert_recipe_into_db(
-            structured_recipe=recipe_dict, text_recipe=recipe_text, dish_name=dish_name
-        )
+        with self._db_lock:
+            self.db_interface.insert_recipe_into_db(
+                structured_recipe=recipe_dict, text_recipe=recipe_text, dish_name=dish_name
+            )
         self.logger.log(f"Saved recipe to database: {self.db_interface.__class__.__name__}")
 
     def save_structured_recipe(self, recipe_dict: Dict, dish_name: str) -> None:
@@ -151,8 +194,9 @@ class ReadRecipePipeline:
         if is_running_in_aws():
             local_output_path = f"/tmp/{dish_name}.yaml"
             write_yaml(recipe_dict, local_output_path, encoding="utf-8")
-            self.s3_client.upload_file(local_output_path, self.bucket_name, self.output_key)
-            self.logger.log(f"Uploaded structured recipe to S3: {self.bucket_name}/{self.output_key}")
+            output_key = self.get_output_key(dish_name)
+            self.s3_client.upload_file(local_output_path, self.bucket_name, output_key)
+            self.logger.log(f"Uploaded structured recipe to S3: {self.bucket_name}/{output_key}")
         else:
             file_path = os.path.join(PROJECT_ROOT, "..", "structured_recipes", f"{dish_name}.yaml")
             write_yaml(recipe_dict, file_path, encoding="utf-8")
@@ -163,11 +207,10 @@ class ReadRecipePipeline:
         Load the text recipe from the given path.
         """
         if is_running_in_aws():
-            s3 = boto3.client('s3')
             local_input_path = f"/tmp/{dish_name}.txt"
-            s3.download_file(self.bucket_name, self.input_key, local_input_path)
+            self.s3_client.download_file(self.bucket_name, self.get_input_key(dish_name), local_input_path)
         else:
-            local_input_path = os.path.join(PROJECT_ROOT, "..", "recipes", client_name, f"{dish_name}.txt")
+            local_input_path = os.path.join(PROJECT_ROOT, "..", "recipes", self.client_name, f"{dish_name}.txt")
         self.logger.log("Loading recipe text from {}".format(local_input_path))
         return read_text(local_input_path)
 
@@ -184,6 +227,7 @@ if __name__ == '__main__':
     # Initialize pipeline
     pipeline = ReadRecipePipeline(
         client_config,
+        client_name=client_name,
     )
 
     # Load the recipe text
@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import copy
+from typing import Dict, List, Optional, Set
+
+from scan_text_recipes.src.model_interface.request_governor import token_stage
+
+# Schedules post-processing stages by the recipe sections they declare (read_sections / write_sections,
+# None meaning the whole recipe). Consecutive stages that do not conflict form a wave; the stages of a wave run
+# concurrently, each on its own copy of the recipe, and their written sections are merged back before the next wave.
+# Ordering between conflicting stages is kept, so the result equals the sequential run.
+
+
+def _sections(stage, attribute: str) -> Optional[Set[str]]:
+    sections = getattr(stage, attribute, None)
+    return None if sections is None else set(sections)
+
+
+def stages_conflict(first, second) -> bool:
+    """
+    Two stages conflict if either writes a section the other reads or writes. Undeclared sections conflict with all.
+    """
+    first_reads, first_writes = _sections(first, "read_sections"), _sections(first, "write_sections")
+    second_reads, second_writes = _sections(second, "read_sections"), _sections(second, "write_sections")
+    if None in (first_reads, first_writes, second_reads, second_writes):
+        return True
+    return bool(first_writes & (second_reads | second_writes)) or bool(second_writes & first_reads)
+
+
+def plan_waves(stages: List) -> List[List]:
+    """
+    Groups consecutive non-conflicting stages into waves, preserving the stage order.
+    """
+    waves = []
+    for stage in stages:
+        if waves and not any(stages_conflict(stage, other) for other in waves[-1]):
+            waves[-1].append(stage)
+        else:
+            waves.append([stage])
+    return waves
+
+
+async def _run_stage(stage, recipe_dict: Dict[str, List], recipe_text: str) -> [bool, Dict[str, List]]:
+    with token_stage(stage.__class__.__name__):  # each task has its own context
+        return await stage.aprocess_recipe(recipe_dict=recipe_dict, recipe_text=recipe_text)
+
+
+async def _run_wave(wave: List, recipe_dict: Dict[str, List], recipe_text: str, logger=None) -> [bool, Dict[str, List]]:
+    if len(wave) == 1:
+        return await _run_stage(wave[0], recipe_dict, recipe_text)
+    if logger is not None:
+        logger.info("Running concurrently: %s", ", ".join(stage.__class__.__name__ for stage in wave))
+    results = await asyncio.gather(*[
+        _run_stage(stage, copy.deepcopy(recipe_dict), recipe_text) for stage in wave
+    ])
+    merged = copy.deepcopy(recipe_dict)
+    for stage, (res, stage_recipe) in zip(wave, results):
+        if not res:
+            if logger is not None:
+                logger.error(f"Error in {stage.__class__.__name__}")
+            return False, stage_recipe
+        for section in stage.write_sections:
+            if section in stage_recipe:
+                merged[section] = stage_recipe[section]
+    return True, merged
+
+
+async def arun_stages(stages: List, recipe_dict: Dict[str, List], recipe_text: str, logger=None) -> [bool, Dict[str, List]]:
+    for wave in plan_waves(stages):
+        res, recipe_dict = await _run_wave(wave, recipe_dict, recipe_text, logger)
+        if not res:
+            return False, recipe_dict
+    return True, recipe_dict
+
+
+def run_coroutine(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code, in a separate thread if an event loop is already running.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
+
+
+def run_stages(stages: List, recipe_dict: Dict[str, List], recipe_text: str, logger=None) -> [bool, Dict[str, List]]:
+    return run_coroutine(arun_stages(stages, recipe_dict, recipe_text, logger))
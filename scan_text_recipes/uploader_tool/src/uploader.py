@@ -52,6 +52,7 @@ class VisToolUploader:
                 col2_container.write("Upload succeeded")
                 print("File Uploaded!")
                 self.upload_button_callback(uploaded_file)
+                self.partial_results_area = col2_container.empty()
                 if col2_container.button("סרוק מתכון"):
                     print("scanning recipe")
                     if "data" not in st.session_state:
@@ -161,6 +162,7 @@ class VisToolUploader:
                        }
                    }
                },
+            partial_results_callback=self.show_partial_results,
         )
         # Run the pipeline on the recipe text
         _, processed_recipe = pipeline.run_pipeline(st.session_state.data['recipe_text'])
@@ -168,6 +170,13 @@ class VisToolUploader:
         # pipeline.save_recipe_to_db(processed_recipe, st.session_state.data['recipe_text'], st.session_state.data["recipe_name"])
         return processed_recipe
 
+    def show_partial_results(self, section_name: str, items: List[Dict]):
+        """
+        Shows the items of a section (e.g. ingredients) as the model streams them, before the recipe is processed.
+        """
+        if section_name == "ingredients":
+            self.partial_results_area.dataframe(pd.DataFrame(items), use_container_width=True)
+
     @staticmethod
     def upload_button_callback(uploaded_file):
         # To read file as string:
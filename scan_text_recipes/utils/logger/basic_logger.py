@@ -1,31 +1,71 @@
 import os
 from abc import abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_current_dish: ContextVar[Optional[str]] = ContextVar("dish_name", default=None)
+
+
+@contextmanager
+def dish_context(dish_name: str):
+    """
+    Logs within the context (including worker threads and tasks started from it) are of dish_name,
+    e.g. while a batch processes several dishes with the same loggers.
+    """
+    token = _current_dish.set(dish_name)
+    try:
+        yield
+    finally:
+        _current_dish.reset(token)
 
 
 class BaseLogger:
     def __init__(self, name: str, **kwargs):
         self.name = name
         self.client_name = os.getenv("CLIENT_NAME")
-        self.dish_name = os.getenv("DISH_NAME")
+        self.default_dish_name = os.getenv("DISH_NAME")
+
+    @property
+    def dish_name(self) -> Optional[str]:
+        return _current_dish.get() or self.default_dish_name
 
     @abstractmethod
-    def log(self, message: str):
+    def log(self, message: str, *args):
         ...
 
     @abstractmethod
-    def info(self, message: str):
+    def info(self, message: str, *args):
         ...
 
     @abstractmethod
-    def warning(self, message: str):
+    def warning(self, message: str, *args):
         ...
 
     @abstractmethod
-    def error(self, message: str):
+    def error(self, message: str, *args):
         ...
 
     @abstractmethod
-    def critical(self, message: str):
+    def critical(self, message: str, *args):
+        ...
+
+    @staticmethod
+    def format_message(message: str, args: tuple) -> str:
+        """
+        %-style lazy formatting: loggers only format the message (with args) if it is actually emitted.
+        """
+        if not args:
+            return str(message)
+        try:
+            return message % args
+        except (TypeError, ValueError):
+            return " ".join([str(message), *map(str, args)])
+
+    def flush(self):
+        """
+        Outputs anything buffered by the logger, called at the end of a pipeline run.
+        """
         ...
 
 
@@ -34,34 +74,34 @@ class DummyLogger(BaseLogger):
         kwargs["name"] = "DummyLogger"
         super().__init__(**kwargs)
 
-    def log(self, message: str):
+    def log(self, message: str, *args):
         ...
 
-    def info(self, message: str):
+    def info(self, message: str, *args):
         ...
 
-    def warning(self, message: str):
+    def warning(self, message: str, *args):
         ...
 
-    def error(self, message: str):
+    def error(self, message: str, *args):
         ...
 
-    def critical(self, message: str):
+    def critical(self, message: str, *args):
         ...
 
 
 class Logger(BaseLogger):
-    def log(self, message: str):
-        print(f"[{self.client_name}/{self.dish_name}]{self.name}: {message}")
+    def log(self, message: str, *args):
+        print(f"[{self.client_name}/{self.dish_name}]{self.name}: {self.format_message(message, args)}")
 
-    def info(self, message: str):
-        print(f"[{self.client_name}/{self.dish_name}]{self.name} [INFO]: {message}")
+    def info(self, message: str, *args):
+        print(f"[{self.client_name}/{self.dish_name}]{self.name} [INFO]: {self.format_message(message, args)}")
 
-    def warning(self, message: str):
-        print(f"[{self.client_name}/{self.dish_name}]{self.name} [WARNING]: {message}")
+    def warning(self, message: str, *args):
+        print(f"[{self.client_name}/{self.dish_name}]{self.name} [WARNING]: {self.format_message(message, args)}")
 
-    def error(self, message: str):
-        print(f"[{self.client_name}/{self.dish_name}]{self.name} [ERROR]: {message}")
+    def error(self, message: str, *args):
+        print(f"[{self.client_name}/{self.dish_name}]{self.name} [ERROR]: {self.format_message(message, args)}")
 
-    def critical(self, message: str):
-        print(f"[{self.client_name}/{self.dish_name}]{self.name} [CRITICAL]: {message}")
+    def critical(self, message: str, *args):
+        print(f"[{self.client_name}/{self.dish_name}]{self.name} [CRITICAL]: {self.format_message(message, args)}")
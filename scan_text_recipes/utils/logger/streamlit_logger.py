@@ -1,32 +1,46 @@
-from typing import List
+import html
+import time
+from collections import deque
+from typing import MutableSequence
 
 from scan_text_recipes.utils.logger.basic_logger import BaseLogger
 
 
 class StreamlitLogger(BaseLogger):
+    """
+    Logs into a Streamlit placeholder.
+    Lines are kept pre-rendered in a bounded buffer (the last max_lines lines), and the placeholder is re-rendered
+    at most max_renders_per_second times per second; errors are rendered immediately and flush() renders
+    whatever is pending. log_lines may be shared by several loggers writing to the same log_area.
+    """
     def __init__(
-            self, name: str, session_state, log_area, log_lines: List[str], fixed_size_window: bool = True, **kwargs
+            self, name: str, session_state, log_area, log_lines: MutableSequence[str] = None,
+            fixed_size_window: bool = True, max_lines: int = 500, max_renders_per_second: float = 4, **kwargs
     ):
         super().__init__(name, **kwargs)
         self.session_state = session_state
         self.log_area = log_area
-        self.log_lines = log_lines
+        self.log_lines = log_lines if log_lines is not None else deque(maxlen=max_lines)
         self.fixed_size_window = fixed_size_window
+        self.max_lines = max_lines
+        self.min_render_interval = 1 / max_renders_per_second if max_renders_per_second else 0
+        self.last_render = 0.
+        self.pending = False
 
-    def log(self, message: str):
-        self.fetch_msg(message, color="gray")
+    def log(self, message: str, *args):
+        self.fetch_msg(self.format_message(message, args), color="gray")
 
-    def info(self, message: str):
-        self.fetch_msg(message, color="green")
+    def info(self, message: str, *args):
+        self.fetch_msg(self.format_message(message, args), color="green")
 
-    def warning(self, message: str):
-        self.fetch_msg(message, color="orange")
+    def warning(self, message: str, *args):
+        self.fetch_msg(self.format_message(message, args), color="orange")
 
-    def error(self, message: str):
-        self.fetch_msg(message, color="red")
+    def error(self, message: str, *args):
+        self.fetch_msg(self.format_message(message, args), color="red", force_render=True)
 
-    def critical(self, message: str):
-        self.fetch_msg(message, color="red")
+    def critical(self, message: str, *args):
+        self.fetch_msg(self.format_message(message, args), color="red", force_render=True)
 
     @property
     def fixed_size_window_header(self, color: str = "#f9ebea", size: str = "300px") -> str:
@@ -45,13 +59,23 @@ class StreamlitLogger(BaseLogger):
         ">
         """
 
-    def fetch_msg(self, msg: str, color="gray"):
-        self.log_lines.append((msg, color))
-        # Re-render
-        html = "<div style='font-family: monospace; white-space: pre;'>"
-        for line, col in self.log_lines:
-            html += f"<span style='color:{col};'>{line}</span><br>"
-        html += "</div>"
+    def fetch_msg(self, msg: str, color="gray", force_render: bool = False):
+        self.log_lines.append(f"<span style='color:{color};'>{html.escape(str(msg))}</span><br>")
+        if len(self.log_lines) > self.max_lines and not isinstance(self.log_lines, deque):
+            del self.log_lines[:len(self.log_lines) - self.max_lines]
+        self.pending = True
+        if force_render or time.monotonic() - self.last_render >= self.min_render_interval:
+            self.render()
+
+    def render(self):
+        html_lines = "<div style='font-family: monospace; white-space: pre;'>" + "".join(self.log_lines) + "</div>"
         if self.fixed_size_window:
-            html = self.fixed_size_window_header + html + "</div>"
-        self.log_area.markdown(html, unsafe_allow_html=True)
+            html_lines = self.fixed_size_window_header + html_lines + "</div>"
+        self.log_area.markdown(html_lines, unsafe_allow_html=True)
+        self.last_render = time.monotonic()
+        self.pending = False
+
+    def flush(self):
+        # log_lines may be shared: other loggers' lines can be pending even if this one's are not
+        if self.pending or self.log_lines:
+            self.render()
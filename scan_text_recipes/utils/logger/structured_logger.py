@@ -0,0 +1,114 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from scan_text_recipes.utils.logger.basic_logger import BaseLogger
+
+LOG_LEVELS = {"LOG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+
+class JsonLogWriter:
+    """
+    Background writer of JSON lines to a file (appended) or to stdout.
+    Records are queued by the loggers and serialized and written by a single daemon thread,
+    so logging calls cost only the message formatting and a queue put.
+    One writer is shared by all loggers of the same destination.
+    """
+    _writers: Dict[Optional[str], "JsonLogWriter"] = {}
+    _writers_lock = threading.Lock()
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.log_path = log_path
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="json-log-writer", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls, log_path: Optional[str] = None) -> "JsonLogWriter":
+        with cls._writers_lock:
+            if log_path not in cls._writers:
+                cls._writers[log_path] = cls(log_path)
+            return cls._writers[log_path]
+
+    def run(self):
+        stream = open(self.log_path, "a", encoding="utf-8") if self.log_path else sys.stdout
+        try:
+            while True:
+                record = self.queue.get()
+                try:
+                    stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    if self.queue.empty():
+                        stream.flush()
+                except Exception as e:  # a bad record must not stop the writer (and block flush forever)
+                    sys.stderr.write(f"JsonLogWriter failed to write a log record: {e!r}\n")
+                finally:
+                    self.queue.task_done()
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+    def put(self, record: Dict):
+        self.queue.put(record)
+
+    def flush(self):
+        """
+        Blocks until all queued records are written, or the writer thread is dead.
+        """
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks and self.thread.is_alive():
+                self.queue.all_tasks_done.wait(timeout=0.5)
+
+
+class JsonLogger(BaseLogger):
+    """
+    Structured logger emitting one JSON line per message: timestamp, level, client, dish, stage and message.
+    Messages below the configured level (LOG, INFO, WARNING, ERROR, CRITICAL; default LOG_LEVEL env or INFO)
+    are dropped before formatting; the rest are formatted in the calling thread (so arguments mutated after the call
+    are logged as they were) and written by a background JsonLogWriter, to log_path (default LOG_PATH env) or to stdout.
+    """
+    def __init__(self, name: str, level: str = None, log_path: str = None, stage: str = None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.level = LOG_LEVELS[(level or os.getenv("LOG_LEVEL", "INFO")).upper()]
+        self.stage = stage or name
+        self.writer = JsonLogWriter.get(log_path or os.getenv("LOG_PATH"))
+
+    def emit(self, level: str, message: str, args: tuple):
+        if LOG_LEVELS[level] < self.level:
+            return
+        self.writer.put({
+            "timestamp": time.time(),
+            "level": level,
+            "client": self.client_name,
+            "dish": self.dish_name,
+            "stage": self.stage,
+            "message": self.format_message(message, args),
+        })
+
+    def log(self, message: str, *args):
+        self.emit("LOG", message, args)
+
+    def info(self, message: str, *args):
+        self.emit("INFO", message, args)
+
+    def warning(self, message: str, *args):
+        self.emit("WARNING", message, args)
+
+    def error(self, message: str, *args):
+        self.emit("ERROR", message, args)
+
+    def critical(self, message: str, *args):
+        self.emit("CRITICAL", message, args)
+
+    def flush(self):
+        self.writer.flush()
+
+
+@atexit.register
+def flush_json_log_writers():
+    for writer in list(JsonLogWriter._writers.values()):
+        writer.flush()
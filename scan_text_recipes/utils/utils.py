@@ -55,10 +55,15 @@ def clean_json_output(text):
     return txt
 
 
-def read_model_config() -> Dict:
-    keys_dict = read_yaml(os.path.join(PROJECT_ROOT, "config", "model_config.yaml"))
+def read_model_config(model_config_path: str = None) -> Dict:
+    keys_dict = read_yaml(model_config_path if model_config_path else os.path.join(PROJECT_ROOT, "config", "model_config.yaml"))
     current_model = keys_dict['CURRENT_MODEL']
-    return easy_dict(keys_dict['MODEL'][current_model])
+    model_config = dict(keys_dict['MODEL'][current_model])
+    # shared settings, a model may override them in its own block
+    for shared_key in ["RESPONSE_CACHE", "CASSETTE"]:
+        if shared_key in keys_dict and shared_key not in model_config:
+            model_config[shared_key] = keys_dict[shared_key]
+    return easy_dict(model_config)
 
 
 def load_yaml_without_comments(yaml_path):